@@ -1,9 +1,22 @@
 """NexTranslation - An intelligent PDF translation tool with formula preservation"""
 from nex_translation.utils.logger import get_logger
-from nex_translation.core.pdf_processor import translate, translate_stream
 
 logger = get_logger(__name__)
 
 __version__ = "1.0.0"
 __author__ = "Ao-chii"
-__email__ = "2543327978@qq.com"
\ No newline at end of file
+__email__ = "2543327978@qq.com"
+
+__all__ = ["translate", "translate_stream", "logger", "__version__"]
+
+
+def __getattr__(name):
+    # 延迟导入翻译入口：pdf_processor 会拉起 pymupdf/pdfminer/numpy 等重依赖，
+    # 仅读取 __version__ 或 logger 时无需加载
+    if name in ("translate", "translate_stream"):
+        from nex_translation.core import pdf_processor
+
+        value = getattr(pdf_processor, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
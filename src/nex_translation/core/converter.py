@@ -3,11 +3,14 @@
 
 import concurrent.futures
 import logging
+import os
 import re
+import threading
 import unicodedata
+from collections import OrderedDict
 from enum import Enum
 from string import Template
-from typing import Dict
+from typing import Dict, Optional
 
 import numpy as np
 from pdfminer.converter import PDFConverter
@@ -20,11 +23,69 @@ from tenacity import retry, wait_fixed
 
 from nex_translation.core.translator import BaseTranslator
 from nex_translation.core.google_translator import GoogleTranslator
+from nex_translation.infrastructure.config import ConfigManager
 from nex_translation.utils.logger import get_logger
 
 
 logger = get_logger(__name__)
 
+# latex 公式字体
+LATEX_FONT_RE = re.compile(r"(CM[^R]|MS.M|XY|MT|BL|RM|EU|LA|RS|LINE|LCIRCLE|TeX-|rsfs|txsy|wasy|stmary|.*Mono|.*Code|.*Ital|.*Sym|.*Math)")
+
+# 翻译器实例缓存：相同服务、模型、环境变量和提示词的文档复用同一翻译器，
+# 保留其连接和进程内翻译缓存
+TRANSLATOR_CACHE_SIZE = 32
+_translators: "OrderedDict[tuple, BaseTranslator]" = OrderedDict()
+_translators_lock = threading.Lock()
+# 按文档统计时只对累计计数求差，maxsize/currsize 为当前占用，原样输出
+_CACHE_COUNTERS = ("hits", "db_hits", "misses", "skipped")
+
+
+def _effective_envs(translator_cls: type, envs: Dict) -> Dict:
+    """按 BaseTranslator.set_envs 的合并顺序（类默认值 < 配置文件 < 系统环境变量 < 传入参数）
+    计算翻译器实际使用的环境变量，配置或系统环境变量变化后缓存键随之变化"""
+    merged = dict(translator_cls.envs)
+    merged.update(ConfigManager.get_instance().get_translator_config(translator_cls.name))
+    merged.update((key, os.environ[key]) for key in merged.keys() & os.environ.keys())
+    merged.update(envs)
+    return merged
+
+
+def get_translator(
+    translator_cls: type,
+    model: Optional[str],
+    envs: Dict,
+    prompt: Optional[Template],
+    ignore_cache: bool,
+) -> BaseTranslator:
+    """获取（必要时创建）翻译器实例"""
+    try:
+        key = (
+            translator_cls,
+            model,
+            tuple(sorted(_effective_envs(translator_cls, envs).items())),
+            prompt.template if prompt else None,
+            ignore_cache,
+        )
+        hash(key)
+    except TypeError:  # 环境变量含不可哈希的值，不缓存
+        return translator_cls(model=model, envs=envs, prompt=prompt, ignore_cache=ignore_cache)
+
+    with _translators_lock:
+        translator = _translators.get(key)
+        if translator is not None:
+            _translators.move_to_end(key)
+            return translator
+    translator = translator_cls(model=model, envs=envs, prompt=prompt, ignore_cache=ignore_cache)
+    with _translators_lock:
+        # 并发创建时保留先写入的实例
+        translator = _translators.setdefault(key, translator)
+        _translators.move_to_end(key)
+        if len(_translators) > TRANSLATOR_CACHE_SIZE:
+            _translators.popitem(last=False)
+    return translator
+
+
 class PDFConverterEx(PDFConverter):
     def __init__(
         self,
@@ -126,14 +187,22 @@ class TranslateConverter(PDFConverterEx):
         super().__init__(rsrcmgr)
         self.vfont = vfont
         self.vchar = vchar
+        # 预编译公式字体/字符规则，避免逐字符匹配时重复查找正则缓存
+        self.vfont_re = re.compile(vfont) if vfont else None
+        self.vchar_re = re.compile(vchar) if vchar else None
         self.thread = thread
         self.layout = layout
         self.noto_name = noto_name if noto_name else "SourceHanSerifCN"  # 默认字体名称
         self.noto = noto
+        self.noto_gid: dict[str, int] = {}      # 字符 -> 字形 ID 缓存
+        self.noto_adv: dict[str, float] = {}    # 字符 -> 单位字号宽度缓存
         # 初始化字体映射
         self.fontmap = {"tiro": None}  # 默认字体映射
         self.fontid = {}  # 字体ID映射
         self.translator: BaseTranslator = None
+        self.executor: concurrent.futures.ThreadPoolExecutor = None  # 翻译线程池，整个文档复用
+        # thread<=0 时使用标准库默认值 min(32, cpu+4)，适合网络密集型翻译
+        self.workers = thread if thread > 0 else min(32, (os.cpu_count() or 1) + 4)
         # e.g. "ollama:gemma2:9b" -> ["ollama", "gemma2:9b"]
         # 确保service不为None
         if service is None:
@@ -146,14 +215,27 @@ class TranslateConverter(PDFConverterEx):
 
         for translator in [GoogleTranslator, ]:
             if service_name == translator.name:
-                self.translator = translator(
-                    model=service_model,
-                    envs=envs,
-                    prompt=prompt,
-                    ignore_cache=ignore_cache
+                self.translator = get_translator(
+                    translator, service_model, envs, prompt, ignore_cache
                 )
         if not self.translator:
             raise ValueError("Unsupported translation service")
+        # 翻译器跨文档复用，记录起始计数以便 close() 只报告本文档的统计
+        self.cache_stats_start = self.translator.cache_info()
+
+    def noto_glyph(self, ch: str) -> int:
+        # 同一字符只向字体查询一次字形 ID
+        gid = self.noto_gid.get(ch)
+        if gid is None:
+            gid = self.noto_gid[ch] = self.noto.has_glyph(ord(ch))
+        return gid
+
+    def noto_advance(self, ch: str) -> float:
+        # 同一字符只向字体查询一次宽度（字号为 1），使用时再乘以字号
+        adv = self.noto_adv.get(ch)
+        if adv is None:
+            adv = self.noto_adv[ch] = self.noto.char_lengths(ch, 1)[0]
+        return adv
 
     def receive_layout(self, ltpage: LTPage):
         # 段落
@@ -183,21 +265,18 @@ class TranslateConverter(PDFConverterEx):
                 except UnicodeDecodeError:
                     font = ""
             font = font.split("+")[-1]      # 字体名截断
-            if re.match(r"\(cid:", char):
+            if char.startswith("(cid:"):
                 return True
             # 基于字体名规则的判定
-            if self.vfont:
-                if re.match(self.vfont, font):
+            if self.vfont_re:
+                if self.vfont_re.match(font):
                     return True
             else:
-                if re.match(                                            # latex 字体
-                    r"(CM[^R]|MS.M|XY|MT|BL|RM|EU|LA|RS|LINE|LCIRCLE|TeX-|rsfs|txsy|wasy|stmary|.*Mono|.*Code|.*Ital|.*Sym|.*Math)",
-                    font,
-                ):
+                if LATEX_FONT_RE.match(font):                           # latex 字体
                     return True
             # 基于字符集规则的判定
-            if self.vchar:
-                if re.match(self.vchar, char):
+            if self.vchar_re:
+                if self.vchar_re.match(char):
                     return True
             else:
                 if (
@@ -324,17 +403,14 @@ class TranslateConverter(PDFConverterEx):
             varl.append(vlstk)
             varf.append(vfix)
         # 只在DEBUG级别打印公式信息
-        if logger.isEnabledFor(logging.DEBUG):
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
             logger.debug("\n==========[VSTACK]==========\n")
-            for id, v in enumerate(var):  # 计算公式宽度
-                l = max([vch.x1 for vch in v]) - v[0].x0
+        for id, v in enumerate(var):  # 计算公式宽度
+            l = max(vch.x1 for vch in v) - v[0].x0
+            vlen.append(l)
+            if debug:
                 logger.debug(f'< {l:.1f} {v[0].x0:.1f} {v[0].y0:.1f} {v[0].cid} {v[0].fontname} {len(varl[id])} > v{id} = {"".join([ch.get_text() for ch in v])}')
-                vlen.append(l)
-        else:
-            # 非DEBUG模式下只计算宽度，不打印日志
-            for id, v in enumerate(var):
-                l = max([vch.x1 for vch in v]) - v[0].x0
-                vlen.append(l)
 
         ############################################################
         # B. 段落翻译
@@ -343,8 +419,6 @@ class TranslateConverter(PDFConverterEx):
 
         @retry(wait=wait_fixed(1), stop=lambda attempt, _: attempt >= 3)  # 最多重试3次
         def worker(s: str):  # 多线程翻译
-            if not s.strip() or re.match(r"^\{v\d+\}$", s):  # 空白和公式不翻译
-                return s
             try:
                 new = self.translator.translate(s)
                 return new
@@ -355,10 +429,31 @@ class TranslateConverter(PDFConverterEx):
                     logger.exception(e, exc_info=False)
                 logger.warning(f"Translation failed after retries, returning original text: {s[:50]}...")
                 return s  # 重试失败后返回原文
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=self.thread
-        ) as executor:
-            news = list(executor.map(worker, sstk))
+
+        def batch_worker(texts: list[str]) -> list[str]:  # 多线程批量翻译，每个线程处理一块
+            # 网络层的重试由共享会话的 urllib3 Retry 负责，这里不再整块重试，失败后直接逐段翻译
+            try:
+                return self.translator.translate_batch(texts)
+            except Exception as e:
+                logger.warning(f"Batch translation failed, falling back to single requests: {e}")
+                return [worker(s) for s in texts]
+
+        news = list(sstk)
+        # 空白和公式不翻译，只把需要翻译的段落按线程数分块，每块批量翻译
+        pending = [i for i, s in enumerate(sstk) if s.strip() and not re.match(r"^\{v\d+\}$", s)]
+        if pending:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+            # 同一页中重复的段落只翻译一次，避免分到不同块后被多个线程同时请求
+            texts = list(dict.fromkeys(sstk[i] for i in pending))
+            size = -(-len(texts) // self.workers)  # 向上取整
+            chunks = [texts[k:k + size] for k in range(0, len(texts), size)]
+            translated = dict(zip(
+                texts,
+                (new for chunk in self.executor.map(batch_worker, chunks) for new in chunk),
+            ))
+            for i in pending:
+                news[i] = translated[sstk[i]]
 
         ############################################################
         # C. 新文档排版
@@ -368,7 +463,7 @@ class TranslateConverter(PDFConverterEx):
                 if self.noto is None:
                     return "".join(["%04x" % ord(c) for c in cstk])
                 else:
-                    return "".join(["%04x" % self.noto.has_glyph(ord(c)) for c in cstk])
+                    return "".join(["%04x" % self.noto_glyph(c) for c in cstk])
             elif fcur in self.fontmap and self.fontmap[fcur] is not None and isinstance(self.fontmap[fcur], PDFCIDFont):  # 判断编码长度
                 return "".join(["%04x" % ord(c) for c in cstk])
             else:
@@ -434,7 +529,7 @@ class TranslateConverter(PDFConverterEx):
                         if self.noto is None:
                             adv = size  # 如果noto为None，使用默认宽度
                         else:
-                            adv = self.noto.char_lengths(ch, size)[0]
+                            adv = size * self.noto_advance(ch)
                     else:
                         adv = self.fontmap[fcur_].char_width(ord(ch)) * size
                     ptr += 1
@@ -533,6 +628,19 @@ class TranslateConverter(PDFConverterEx):
         ops = f"BT {''.join(ops_list)}ET "
         return ops
 
+    def close(self) -> None:
+        # 释放文档级翻译线程池
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        stats = self.translator.cache_info()
+        for key in _CACHE_COUNTERS:
+            stats[key] -= self.cache_stats_start.get(key, 0)
+        logger.debug(f"翻译缓存统计: {stats}")
+        if stats["skipped"]:
+            logger.info(f"跳过 {stats['skipped']} 段无需翻译的文本（数字、符号或网址）")
+        super().close()
+
 
 class OpType(Enum):
     TEXT = "text"
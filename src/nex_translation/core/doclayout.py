@@ -1,4 +1,5 @@
 import abc
+import threading
 
 import cv2
 import numpy as np
@@ -8,6 +9,8 @@ from babeldoc.assets.assets import get_doclayout_onnx_model_path
 import onnx
 import onnxruntime
 
+_load_lock = threading.Lock()  # CLI 批量任务和 Gradio 工作线程可能同时首次加载
+
 class DocLayoutModel(abc.ABC):
     @staticmethod
     def load_onnx():
@@ -16,7 +19,11 @@ class DocLayoutModel(abc.ABC):
 
     @staticmethod
     def load_available():
-        return DocLayoutModel.load_onnx()
+        # 进程内只加载一次，CLI/GUI 共享同一个模型实例
+        with _load_lock:
+            if ModelInstance.value is None:
+                ModelInstance.value = DocLayoutModel.load_onnx()
+            return ModelInstance.value
 
     @property
     @abc.abstractmethod
@@ -1,17 +1,81 @@
 import re
 import html
+import threading
 import requests
-from typing import Optional
+from typing import List, Optional
 from string import Template
 from ..core.translator import BaseTranslator
 from ..utils.exceptions import TranslationError
+from ..utils.http import make_retrying_session
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 批量翻译时的分段标记，Google 翻译会原样保留
+_BATCH_MARKER = "\n###%d###\n"
+_BATCH_SPLIT_RE = re.compile(r"\s*###\d+###\s*")
+# 从返回页面中提取翻译结果；直接匹配原始字节，避免解码整个页面
+_RESULT_RE = re.compile(rb'class="(?:t0|result-container)">(.*?)<', re.DOTALL)
+# Google 返回结果中常见的 HTML 实体
+_ENTITY_MAP = {
+    "&quot;": '"',
+    "&#39;": "'",
+    "&amp;": "&",
+    "&lt;": "<",
+    "&gt;": ">",
+    "&nbsp;": "\xa0",
+}
+_ENTITY_RE = re.compile("|".join(_ENTITY_MAP))
+
+
+def _fast_unescape(text: str) -> str:
+    """解码常见 HTML 实体，遇到其他实体时回退到 html.unescape"""
+    if "&" not in text:
+        return text
+    if text.count("&") == len(_ENTITY_RE.findall(text)):
+        return _ENTITY_RE.sub(lambda m: _ENTITY_MAP[m.group()], text)
+    return html.unescape(text)
+
+# 所有 GoogleTranslator 实例共享的会话，跨文档复用连接池
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """获取共享会话：连接池复用 TCP/TLS 连接，并对限流和服务端错误做指数退避重试"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_retrying_session(pool_connections=20, pool_maxsize=100)
+        return _session
+
+
+_warmed_up = False
+
+
+def _warmup(url: str) -> None:
+    """后台预先建立到翻译服务的连接，首次翻译时无需等待 TCP/TLS 握手；只执行一次"""
+    global _warmed_up
+    with _session_lock:
+        if _warmed_up:
+            return
+        _warmed_up = True
+
+    def run():
+        try:
+            _get_session().head(url, timeout=5)
+        except requests.RequestException as e:
+            logger.debug("Connection warmup failed: %s", e)
+
+    threading.Thread(target=run, name="google-translate-warmup", daemon=True).start()
+
+
 class GoogleTranslator(BaseTranslator):
     """Google翻译实现类"""
     name = "google"
+    lang_in = "en"  # 源语言
+    lang_out = "zh-CN"  # 目标语言
+    max_chars = 5000  # 单次请求的最大字符数
     
     def __init__(
         self,
@@ -21,48 +85,54 @@ class GoogleTranslator(BaseTranslator):
         ignore_cache: bool = False,
     ):
         super().__init__(model, envs, prompt, ignore_cache)
+        # 语言对决定翻译结果，需计入缓存键
+        self.add_cache_impact_parameters("sl", self.lang_in)
+        self.add_cache_impact_parameters("tl", self.lang_out)
         self.endpoint = "https://translate.google.com/m"
         self.headers = {
             "User-Agent": "Mozilla/4.0 (compatible;MSIE 6.0;Windows NT 5.1;SV1;.NET CLR 1.1.4322;.NET CLR 2.0.50727;.NET CLR 3.0.04506.30)"  # noqa: E501
         }
-        self.session = requests.Session()
+        self.session = _get_session()
+        _warmup(self.endpoint)
         logger.debug(f"Initialized {self.name} translator")
         
     def do_translate(self, text: str) -> str:
         """执行翻译"""
-        if len(text) > 5000:
-            logger.error(f"Text length ({len(text)}) exceeds limit (5000)")
-            raise TranslationError("Text too long for Google Translate (max 5000 chars)")
+        if len(text) > self.max_chars:
+            logger.error(f"Text length ({len(text)}) exceeds limit ({self.max_chars})")
+            raise TranslationError(f"Text too long for Google Translate (max {self.max_chars} chars)")
             
         try:
-            logger.debug(f"Sending translation request for text: {text[:100]}...")
+            logger.debug("Sending translation request for text: %.100s...", text)
             # 发送请求到Google翻译
             response = self.session.get(
                 self.endpoint,
                 params={
-                    "tl": "zh-CN",
-                    "sl": "en",
+                    "tl": self.lang_out,
+                    "sl": self.lang_in,
                     "q": text,
                 },
                 headers=self.headers,
-                timeout=30,
+                timeout=(3, 30),  # (连接超时, 读取超时)
             )
             
-            if response.status_code == 400:
-                logger.error("Google Translate API returned 400 error")
-                raise TranslationError("Google Translate API error")
-                
-            response.raise_for_status()
+            # 成功响应直接进入解析，仅在异常状态码时走错误处理
+            if response.status_code != 200:
+                if response.status_code == 400:
+                    logger.error("Google Translate API returned 400 error")
+                    raise TranslationError("Google Translate API error")
+                response.raise_for_status()
             
-            # 使用正则表达式提取翻译结果
-            result = re.findall(r'(?s)class="(?:t0|result-container)">(.*?)<', response.text)
-            if not result:
+            # 使用预编译正则提取翻译结果，只需第一个匹配
+            result = _RESULT_RE.search(response.content)
+            if result is None:
                 logger.error("Failed to extract translation from response")
                 raise TranslationError("Failed to extract translation result")
 
-            # 解码HTML实体(如&quot;)并去除首尾空白    
-            translated_text = html.unescape(result[0]).strip()
-            logger.debug(f"Translation successful. Result: {translated_text[:100]}...")
+            # 只解码匹配到的片段，再解码HTML实体(如&quot;)并去除首尾空白
+            translated_text = result.group(1).decode(response.encoding or "utf-8", errors="replace")
+            translated_text = _fast_unescape(translated_text).strip()
+            logger.debug("Translation successful. Result: %.100s...", translated_text)
             return translated_text
             
         except requests.RequestException as e:
@@ -70,4 +140,46 @@ class GoogleTranslator(BaseTranslator):
             raise TranslationError(f"Request failed: {str(e)}")
         except Exception as e:
             logger.error(f"Unexpected error during translation: {str(e)}")
-            raise TranslationError(f"Translation failed: {str(e)}")
\ No newline at end of file
+            raise TranslationError(f"Translation failed: {str(e)}")
+
+    def do_translate_batch(self, texts: List[str]) -> List[str]:
+        """将多段文本用分段标记拼接后合并请求，减少 HTTP 往返次数"""
+        results: List[str] = []
+        for batch in self._pack(texts):
+            results.extend(self._translate_packed(batch))
+        return results
+
+    def _pack(self, texts: List[str]) -> List[List[str]]:
+        """按字符上限贪心分组，超长文本单独成组"""
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        size = 0
+        for text in texts:
+            # 首段不加分段标记
+            cost = len(text) + (len(_BATCH_MARKER % len(batch)) if batch else 0)
+            if batch and size + cost > self.max_chars:
+                batches.append(batch)
+                batch, size = [], 0
+                cost = len(text)
+            batch.append(text)
+            size += cost
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _translate_packed(self, batch: List[str]) -> List[str]:
+        """翻译一组拼接文本，分段数量不一致时回退为逐条翻译"""
+        if len(batch) == 1:
+            return [self.do_translate(batch[0])]
+        query = "".join(
+            (_BATCH_MARKER % i if i else "") + text for i, text in enumerate(batch)
+        )
+        parts = _BATCH_SPLIT_RE.split(self.do_translate(query))
+        if len(parts) != len(batch):
+            logger.debug(
+                "Batch split mismatch (%d != %d), falling back to single requests",
+                len(parts),
+                len(batch),
+            )
+            return [self.do_translate(text) for text in batch]
+        return [part.strip() for part in parts]
@@ -1,15 +1,17 @@
 """Functions that can be used for the most common use-cases for src.six"""
 
-import asyncio
+import concurrent.futures
 import io
 import os
 import re
 import sys
 import tempfile
+import threading
+import time
 from asyncio import CancelledError
 from pathlib import Path
 from string import Template
-from typing import Any, BinaryIO, List, Optional, Dict
+from typing import Any, BinaryIO, Collection, List, Optional, Dict
 
 import numpy as np
 import requests
@@ -24,12 +26,67 @@ from pymupdf import Document, Font
 from nex_translation.core.converter import TranslateConverter
 from nex_translation.core.doclayout import OnnxModel
 from nex_translation.core.pdfinterpreter import PDFPageInterpreterEx
+from nex_translation.utils.http import make_retrying_session
 from nex_translation.utils.logger import get_logger
 from nex_translation.infrastructure.config import ConfigManager
 from babeldoc.assets.assets import get_font_and_metadata
 
 logger = get_logger(__name__)
 NOTO_NAME = "noto"
+PROGRESS_MIN_INTERVAL = 0.1  # 进度回调的最小间隔（秒）
+SAVE_OPTIONS = {"deflate": True, "garbage": 3, "use_objstms": 1}  # 输出 PDF 的保存参数
+_cjk_font_path: Optional[str] = None  # 已解析的思源字体路径
+_cjk_font_lock = threading.Lock()
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # 下载远程 PDF 时每次写入的字节数
+_download_session: Optional[requests.Session] = None
+_download_session_lock = threading.Lock()
+# 字体资源键及其子键前缀，可能位于页面资源或 xobj 资源中
+FONT_RESOURCE_KEYS = (("Resources/Font", "Resources/Font/"), ("Font", "Font/"))
+_XREF_INDIRECT_RE = re.compile(r"(\d+) 0 R")
+MAX_LAYOUT_EDGE = 1280  # 版面检测模型输入的最大边长
+# 保持原样、不参与翻译的版面类别
+LAYOUT_SKIP_CLASSES = ("abandon", "figure", "table", "isolate_formula", "formula_caption")
+
+
+def _get_download_session() -> requests.Session:
+    """获取下载远程 PDF 的共享会话，复用连接并对临时错误重试"""
+    global _download_session
+    with _download_session_lock:
+        if _download_session is None:
+            _download_session = make_retrying_session(pool_connections=4, pool_maxsize=8)
+        return _download_session
+
+
+def build_layout_mask(page_layout, height: int, width: int) -> np.ndarray:
+    """
+    将版面检测框渲染成掩码，用空间换时间（kdtree 是不可能 kdtree 的）
+    文本框区域为 序号+2，保留区域为 0，其余为 1
+    """
+    boxes = page_layout.boxes
+    # 标签最大为 框数+1，多数页面 uint8 即可容纳
+    dtype = np.uint8 if len(boxes) + 2 <= np.iinfo(np.uint8).max else np.uint16
+    box = np.ones((height, width), dtype=dtype)
+    if not boxes:
+        return box
+    data = np.array([(*d.xyxy, d.cls) for d in boxes], dtype=np.float64).reshape(-1, 5)
+    xyxy = data[:, :4]
+    # 一次性完成所有框的外扩、坐标翻转和裁剪；astype(int) 与 int() 一样向零取整
+    x0 = np.clip((xyxy[:, 0] - 1).astype(int), 0, width - 1)
+    y0 = np.clip((height - xyxy[:, 3] - 1).astype(int), 0, height - 1)
+    x1 = np.clip((xyxy[:, 2] + 1).astype(int), 0, width - 1)
+    y1 = np.clip((height - xyxy[:, 1] + 1).astype(int), 0, height - 1)
+    # 先把类别名换算成类别 ID（每页只遍历一次类别表），再整体判断每个框是否为保留区域
+    names = page_layout.names
+    items = names.items() if isinstance(names, dict) else enumerate(names)
+    skip_ids = [i for i, name in items if name in LAYOUT_SKIP_CLASSES]
+    skip = np.isin(data[:, 4].astype(int), skip_ids)
+    # 先画文本框，再用保留区域覆盖
+    for i in np.flatnonzero(~skip):
+        box[y0[i]:y1[i], x0[i]:x1[i]] = i + 2
+    for i in np.flatnonzero(skip):
+        box[y0[i]:y1[i], x0[i]:x1[i]] = 0
+    return box
+
 
 def check_files(files: List[str]) -> List[str]:
     files = [
@@ -44,7 +101,7 @@ def check_files(files: List[str]) -> List[str]:
 
 def translate_patch(
     inf: BinaryIO,
-    pages: Optional[list[int]] = None,
+    pages: Optional[Collection[int]] = None,
     vfont: str = "",
     vchar: str = "",
     thread: int = 0,
@@ -53,7 +110,7 @@ def translate_patch(
     noto_name: str = "",
     noto: Font = None,
     callback: object = None,
-    cancellation_event: asyncio.Event = None,
+    cancellation_event: threading.Event = None,
     model: OnnxModel = None,
     envs: Dict = None,
     prompt: Template = None,
@@ -84,75 +141,95 @@ def translate_patch(
     else:
         total_pages = doc_zh.page_count
 
+    # 进度回调按页数步长和时间间隔节流，最后一页总是回调
+    progress_step = max(1, total_pages // 200)
+    last_emit = 0.0
+
     parser = PDFParser(inf)
     doc = PDFDocument(parser)
-    with tqdm.tqdm(total=total_pages) as progress:
-        for pageno, page in enumerate(PDFPage.create_pages(doc)):
-            if cancellation_event and cancellation_event.is_set():
-                raise CancelledError("task cancelled")
-            if pages and (pageno not in pages):
-                continue
-            progress.update()
-            if callback:
-                callback(progress)
-            page.pageno = pageno
-            pix = doc_zh[page.pageno].get_pixmap()
-            image = np.fromstring(pix.samples, np.uint8).reshape(
-                pix.height, pix.width, 3
-            )[:, :, ::-1]
-            page_layout = model.predict(image, imgsz=int(pix.height / 32) * 32)[0]
-            # kdtree 是不可能 kdtree 的，不如直接渲染成图片，用空间换时间
-            box = np.ones((pix.height, pix.width))
-            h, w = box.shape
-            vcls = ["abandon", "figure", "table", "isolate_formula", "formula_caption"]
-            for i, d in enumerate(page_layout.boxes):
-                if page_layout.names[int(d.cls)] not in vcls:
-                    x0, y0, x1, y1 = d.xyxy.squeeze()
-                    x0, y0, x1, y1 = (
-                        np.clip(int(x0 - 1), 0, w - 1),
-                        np.clip(int(h - y1 - 1), 0, h - 1),
-                        np.clip(int(x1 + 1), 0, w - 1),
-                        np.clip(int(h - y0 + 1), 0, h - 1),
-                    )
-                    box[y0:y1, x0:x1] = i + 2
-            for i, d in enumerate(page_layout.boxes):
-                if page_layout.names[int(d.cls)] in vcls:
-                    x0, y0, x1, y1 = d.xyxy.squeeze()
-                    x0, y0, x1, y1 = (
-                        np.clip(int(x0 - 1), 0, w - 1),
-                        np.clip(int(h - y1 - 1), 0, h - 1),
-                        np.clip(int(x1 + 1), 0, w - 1),
-                        np.clip(int(h - y0 + 1), 0, h - 1),
-                    )
-                    box[y0:y1, x0:x1] = 0
-            layout[page.pageno] = box
-            # 新建一个 xref 存放新指令流
-            page.page_xref = doc_zh.get_new_xref()  # hack 插入页面的新 xref
-            doc_zh.update_object(page.page_xref, "<<>>")
-            doc_zh.update_stream(page.page_xref, b"")
-            doc_zh[page.pageno].set_contents(page.page_xref)
-            interpreter.process_page(page)
-
-    device.close()
+    selected = (
+        (pageno, page)
+        for pageno, page in enumerate(PDFPage.create_pages(doc))
+        if not pages or pageno in pages
+    )
+
+    def submit_layout(pageno: int):
+        # PyMuPDF 非线程安全，渲染在当前线程完成；版面预测交给后台线程。
+        # 页面对象随预测结果一起返回，解析该页时直接复用，同一页只取一次
+        page_zh = doc_zh[pageno]
+        pix = page_zh.get_pixmap()
+        # frombuffer 直接引用像素缓冲区，不复制；RGB->BGR 只是视图
+        image = np.frombuffer(pix.samples, np.uint8).reshape(
+            pix.height, pix.width, 3
+        )[:, :, ::-1]
+        # 推理尺寸对齐到 32 并设上限；预测框会按原图尺寸还原，掩码分辨率不受影响
+        imgsz = max(32, min(pix.height, MAX_LAYOUT_EDGE) // 32 * 32)
+        return layout_executor.submit(
+            model.predict, image, imgsz=imgsz
+        ), page_zh, pix.height, pix.width
+
+    # 取消或出错时也要关闭 device，释放转换器的翻译线程池
+    try:
+        # 流水线：解析当前页的同时预测下一页版面
+        with tqdm.tqdm(total=total_pages) as progress, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=1) as layout_executor:
+            current = next(selected, None)
+            pending = submit_layout(current[0]) if current else None
+            while current is not None:
+                pageno, page = current
+                if cancellation_event and cancellation_event.is_set():
+                    raise CancelledError("task cancelled")
+                progress.update()
+                if callback:
+                    now = time.monotonic()
+                    if progress.n == total_pages or (
+                        progress.n % progress_step == 0
+                        and now - last_emit >= PROGRESS_MIN_INTERVAL
+                    ):
+                        last_emit = now
+                        callback(progress)
+                page.pageno = pageno
+                future, page_zh, height, width = pending
+                page_layout = future.result()[0]
+                current = next(selected, None)
+                pending = submit_layout(current[0]) if current else None
+                box = build_layout_mask(page_layout, height, width)
+                layout[page.pageno] = box
+                # 新建一个 xref 存放新指令流
+                page.page_xref = doc_zh.get_new_xref()  # hack 插入页面的新 xref
+                doc_zh.update_object(page.page_xref, "<<>>")
+                doc_zh.update_stream(page.page_xref, b"")
+                page_zh.set_contents(page.page_xref)
+                interpreter.process_page(page)
+                # 掩码只在解析本页时使用，及时释放，整个文档同一时间只保留一页
+                layout.pop(page.pageno, None)
+    finally:
+        device.close()
     return obj_patch
 
 
 def translate_stream(
     stream: bytes,
-    pages: Optional[list[int]] = None,
+    pages: Optional[Collection[int]] = None,
     service: str = "",
     thread: int = 0,
     vfont: str = "",
     vchar: str = "",
     callback: object = None,
-    cancellation_event: asyncio.Event = None,
+    cancellation_event: threading.Event = None,
     model: OnnxModel = None,
     envs: Dict = None,
     prompt: Template = None,
     skip_subset_fonts: bool = False,
     ignore_cache: bool = False,
+    output_files: Optional[tuple] = None,
     **kwarg: Any,
 ):
+    """
+    翻译 PDF 字节流
+    默认返回 (单语版, 双语版) 的字节串；传入 output_files=(单语路径, 双语路径) 时
+    直接保存到磁盘并返回路径，避免在内存中多保留一份序列化结果
+    """
     font_list = [("tiro", None)]
 
     font_path = download_remote_fonts()
@@ -160,9 +237,8 @@ def translate_stream(
     noto = Font(noto_name, font_path)
     font_list.append((noto_name, font_path))
 
+    # 两个文档直接从同一份原始字节打开，无需先序列化 doc_en 再解析一遍
     doc_en = Document(stream=stream)
-    stream = io.BytesIO()
-    doc_en.save(stream)
     doc_zh = Document(stream=stream)
     page_count = doc_zh.page_count
     # font_list = [("GoNotoKurrent-Regular.ttf", font_path), ("tiro", None)]
@@ -170,30 +246,47 @@ def translate_stream(
     for page in doc_zh:
         for font in font_list:
             font_id[font[0]] = page.insert_font(font[0], font[1])
-    xreflen = doc_zh.xref_length()
-    for xref in range(1, xreflen):
-        for label in ["Resources/", ""]:  # 可能是基于 xobj 的 res
+    # 只遍历页面（含继承资源的父节点）及其引用的 xobj，visited 去重共享的资源
+    stack = [page.xref for page in doc_zh]
+    visited = set()
+    while stack:
+        xref = stack.pop()
+        if xref in visited:
+            continue
+        visited.add(xref)
+        for font_key, target_key_prefix in FONT_RESOURCE_KEYS:  # 可能是基于 xobj 的 res
             try:  # xref 读写可能出错
-                font_res = doc_zh.xref_get_key(xref, f"{label}Font")
-                target_key_prefix = f"{label}Font/"
+                target_xref = xref
+                font_res = doc_zh.xref_get_key(xref, font_key)
                 if font_res[0] == "xref":
-                    resource_xref_id = re.search("(\\d+) 0 R", font_res[1]).group(1)
-                    xref = int(resource_xref_id)
-                    font_res = ("dict", doc_zh.xref_object(xref))
+                    resource_xref_id = _XREF_INDIRECT_RE.search(font_res[1]).group(1)
+                    target_xref = int(resource_xref_id)
+                    font_res = ("dict", doc_zh.xref_object(target_xref))
                     target_key_prefix = ""
 
                 if font_res[0] == "dict":
                     for font in font_list:
                         target_key = f"{target_key_prefix}{font[0]}"
-                        font_exist = doc_zh.xref_get_key(xref, target_key)
+                        font_exist = doc_zh.xref_get_key(target_xref, target_key)
                         if font_exist[0] == "null":
                             doc_zh.xref_set_key(
-                                xref,
+                                target_xref,
                                 target_key,
                                 f"{font_id[font[0]]} 0 R",
                             )
             except Exception:
                 pass
+        # 继续访问父节点（继承的资源）和 xobj 子对象
+        for child_key in ("Parent", "Resources/XObject"):
+            try:
+                kind, value = doc_zh.xref_get_key(xref, child_key)
+                if kind == "xref" and child_key != "Parent":
+                    value = doc_zh.xref_object(int(_XREF_INDIRECT_RE.search(value).group(1)))
+                    kind = "dict"
+                if kind in ("xref", "dict"):
+                    stack.extend(int(x) for x in _XREF_INDIRECT_RE.findall(value))
+            except Exception:
+                pass
 
     fp = io.BytesIO()
 
@@ -203,15 +296,22 @@ def translate_stream(
     for obj_id, ops_new in obj_patch.items():
         doc_zh.update_stream(obj_id, ops_new.encode())
 
+    # 先子集化译文文档，双语文档插入的就是已裁剪的字体，后续子集化工作量更小
+    if not skip_subset_fonts:
+        doc_zh.subset_fonts(fallback=True)
     doc_en.insert_file(doc_zh)
     for id in range(page_count):
         doc_en.move_page(page_count + id, id * 2 + 1)
     if not skip_subset_fonts:
-        doc_zh.subset_fonts(fallback=True)
         doc_en.subset_fonts(fallback=True)
+    if output_files:
+        file_mono, file_dual = output_files
+        doc_zh.save(file_mono, **SAVE_OPTIONS)
+        doc_en.save(file_dual, **SAVE_OPTIONS)
+        return file_mono, file_dual
     return (
-        doc_zh.write(deflate=True, garbage=3, use_objstms=1),
-        doc_en.write(deflate=True, garbage=3, use_objstms=1),
+        doc_zh.write(**SAVE_OPTIONS),
+        doc_en.write(**SAVE_OPTIONS),
     )
 
 
@@ -267,14 +367,14 @@ def convert_to_pdfa(input_path, output_path):
 def translate(
     files: list[str],
     output: str = "",
-    pages: Optional[list[int]] = None,
+    pages: Optional[Collection[int]] = None,
     service: str = "",
     thread: int = 0,
     vfont: str = "",
     vchar: str = "",
     callback: object = None,
     compatible: bool = False,
-    cancellation_event: asyncio.Event = None,
+    cancellation_event: threading.Event = None,
     model: OnnxModel = None,
     envs: Dict = None,
     prompt: Template = None,
@@ -301,16 +401,20 @@ def translate(
         ):
             print("Online files detected, downloading...")
             try:
-                r = requests.get(file, allow_redirects=True)
-                if r.status_code == 200:
-                    with tempfile.NamedTemporaryFile(
-                        suffix=".pdf", delete=False
-                    ) as tmp_file:
-                        print(f"Writing the file: {file}...")
-                        tmp_file.write(r.content)
-                        file = tmp_file.name
-                else:
-                    r.raise_for_status()
+                with _get_download_session().get(
+                    file, allow_redirects=True, stream=True, timeout=30
+                ) as r:
+                    if r.status_code == 200:
+                        # 分块写入临时文件，不在内存中缓存整个 PDF
+                        with tempfile.NamedTemporaryFile(
+                            suffix=".pdf", delete=False
+                        ) as tmp_file:
+                            print(f"Writing the file: {file}...")
+                            for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                                tmp_file.write(chunk)
+                            file = tmp_file.name
+                    else:
+                        r.raise_for_status()
             except Exception as e:
                 raise PDFValueError(
                     f"Errors occur in downloading the PDF file. Please check the link(s).\nError:\n{e}"
@@ -343,52 +447,57 @@ def translate(
         except Exception as e:
             logger.warning(f"Failed to clean temp file {file_path}", exc_info=True)
 
-        s_mono, s_dual = translate_stream(
+        file_mono = Path(output) / f"{filename}-mono.pdf"
+        file_dual = Path(output) / f"{filename}-dual.pdf"
+        # 由 PyMuPDF 直接写入文件，不经过内存中的完整字节串
+        translate_stream(
             s_raw,
+            output_files=(str(file_mono), str(file_dual)),
             **locals(),
         )
-        file_mono = Path(output) / f"{filename}-mono.pdf"
-        file_dual = Path(output) / f"{filename}-dual.pdf"
-        doc_mono = open(file_mono, "wb")
-        doc_dual = open(file_dual, "wb")
-        doc_mono.write(s_mono)
-        doc_dual.write(s_dual)
-        doc_mono.close()
-        doc_dual.close()
         result_files.append((str(file_mono), str(file_dual)))
 
     return result_files
 
 
 def download_remote_fonts() -> str:
-    """下载并返回思源字体路径"""
-    font_name = "SourceHanSerifCN-Regular.ttf"
-    # 使用 ConfigManager 获取字体路径配置
-    font_path = ConfigManager.get_instance()._config_data.get("CJK_FONT_PATH", Path("/app", font_name).as_posix())
+    """下载并返回思源字体路径；解析成功后在进程内缓存，后续调用不再读取配置和检查文件"""
+    global _cjk_font_path
+    with _cjk_font_lock:
+        if _cjk_font_path is not None:
+            return _cjk_font_path
+        resolved = True
+        font_name = "SourceHanSerifCN-Regular.ttf"
+        # 使用 ConfigManager 获取字体路径配置
+        font_path = ConfigManager.get_instance().get("CJK_FONT_PATH", Path("/app", font_name).as_posix())
     
-    if not Path(font_path).exists():
-        try:
-            # 获取字体路径
-            font_path_obj, _ = get_font_and_metadata(font_name)
+        if not Path(font_path).exists():
+            try:
+                # 获取字体路径
+                font_path_obj, _ = get_font_and_metadata(font_name)
             
-            # 确保font_path是字符串
-            if hasattr(font_path_obj, "as_posix"):
-                font_path = font_path_obj.as_posix()
-            elif isinstance(font_path_obj, str):
-                font_path = font_path_obj
-            else:
-                font_path = str(font_path_obj)
+                # 确保font_path是字符串
+                if hasattr(font_path_obj, "as_posix"):
+                    font_path = font_path_obj.as_posix()
+                elif isinstance(font_path_obj, str):
+                    font_path = font_path_obj
+                else:
+                    font_path = str(font_path_obj)
             
-            # 更新配置
-            with ConfigManager.get_instance()._lock:
-                ConfigManager.get_instance()._config_data["CJK_FONT_PATH"] = font_path
-                ConfigManager.get_instance()._save_config()
-        except Exception as e:
-            logger.error(f"获取字体失败: {e}")
-            # 使用默认路径作为后备
-            font_path = str(Path("/app", font_name))
-
-    logger.info(f"使用字体: {font_path}")
-
-    # 确保返回的是字符串
-    return str(font_path)
+                # 更新配置
+                with ConfigManager.get_instance()._lock:
+                    ConfigManager.get_instance()._config_data["CJK_FONT_PATH"] = font_path
+                    ConfigManager.get_instance()._save_config()
+            except Exception as e:
+                logger.error(f"获取字体失败: {e}")
+                # 使用默认路径作为后备，不缓存以便下次重试
+                font_path = str(Path("/app", font_name))
+                resolved = False
+
+        logger.info(f"使用字体: {font_path}")
+
+        # 确保返回的是字符串
+        font_path = str(font_path)
+        if resolved:
+            _cjk_font_path = font_path
+        return font_path
@@ -296,7 +296,7 @@ class PDFPageInterpreterEx(PDFPageInterpreter):
 
     def execute(self, streams: Sequence[object]) -> None:
         # 重载返回指令流
-        ops = ""
+        ops = []  # 逐条收集指令，最后一次性拼接
         try:
             parser = PDFContentParser(streams)
         except PSEOF:
@@ -335,7 +335,7 @@ class PDFPageInterpreterEx(PDFPageInterpreter):
                                         for x in args
                                     ]
                                 )
-                                ops += f"{p} {name} "
+                                ops.append(f"{p} {name} ")
                     else:
                         # log.debug("exec: %s", name)
                         targs = func()
@@ -352,11 +352,11 @@ class PDFPageInterpreterEx(PDFPageInterpreter):
                                     for x in targs
                                 ]
                             )
-                            ops += f"{p} {name} "
+                            ops.append(f"{p} {name} ")
                 elif settings.STRICT:
                     error_msg = "Unknown operator: %r" % name
                     raise PDFInterpreterError(error_msg)
             else:
                 self.push(obj)
         # print('REV DATA',ops)
-        return ops
+        return "".join(ops)
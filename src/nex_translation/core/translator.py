@@ -1,20 +1,22 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from string import Template
 import logging
-from copy import copy
 import os
+import re
+import threading
 
 from ..infrastructure.cache import TranslationCache
 from ..infrastructure.config import ConfigManager
 from ..utils.logger import get_logger
 
-from tenacity import retry, retry_if_exception_type
-from tenacity import stop_after_attempt
-from tenacity import wait_exponential
-
 logger = get_logger(__name__)
 
+# 公式占位符，判断是否需要翻译时忽略
+_PLACEHOLDER_RE = re.compile(r"\{v\d+\}")
+# 单个网址或邮箱地址，无需翻译
+_NO_TRANSLATE_RE = re.compile(r"(?:https?://|www\.)\S+|[^\s@]+@[^\s@]+\.\S+")
+
 class BaseTranslator(ABC):
     """翻译器基类"""
     
@@ -40,8 +42,15 @@ class BaseTranslator(ABC):
         self.model = model
         self.ignore_cache = ignore_cache
         self.set_envs(envs)
-        self.cache = TranslationCache()
+        # 缓存按翻译引擎区分，并记录影响翻译结果的参数
+        self.cache = TranslationCache(self.name)
+        if model:
+            self.add_cache_impact_parameters("model", model)
+        if prompt:
+            self.add_cache_impact_parameters("prompt", prompt.template)
         self.prompt_template = prompt
+        self._stats_lock = threading.Lock()
+        self._skipped = 0  # 无需翻译而直接返回原文的次数
 
     def set_envs(self, envs: Optional[Dict] = None):
         """设置环境变量"""
@@ -50,7 +59,7 @@ class BaseTranslator(ABC):
             config_manager = ConfigManager.get_instance()
             
             # 复制类默认值
-            self.envs = copy(self.envs)
+            self.envs = dict(self.envs)
             
             # 获取配置文件中的设置
             try:
@@ -60,28 +69,24 @@ class BaseTranslator(ABC):
             except Exception as e:
                 logger.warning(f"Failed to load config for {self.name}: {str(e)}")
             
-            # 检查环境变量是否有更新
-            need_update = False
-            for key in self.envs:
-                if key in os.environ:
-                    if self.envs[key] != os.environ[key]:
-                        self.envs[key] = os.environ[key]
-                        need_update = True
-            
-            # 如果环境变量有更新，保存到配置文件
-            if need_update:
-                try:
-                    config_manager.update_translator_config(self.name, self.envs)
-                except Exception as e:
-                    logger.warning(f"Failed to save updated config for {self.name}: {str(e)}")
+            base_envs = dict(self.envs)
+
+            # 检查环境变量是否有更新（只遍历两者共有的键）
+            self.envs.update(
+                (key, os.environ[key])
+                for key in self.envs.keys() & os.environ.keys()
+            )
             
             # 处理传入的配置参数
             if envs:
                 self.envs.update(envs)
+
+            # 合并后的配置有变化时才写回配置文件，且只写一次
+            if self.envs != base_envs:
                 try:
                     config_manager.update_translator_config(self.name, self.envs)
                 except Exception as e:
-                    logger.warning(f"Failed to save config with new envs for {self.name}: {str(e)}")
+                    logger.warning(f"Failed to save updated config for {self.name}: {str(e)}")
                 
         except Exception as e:
             logger.error(f"Error in set_envs for {self.name}: {str(e)}")
@@ -101,15 +106,82 @@ class BaseTranslator(ABC):
         Returns:
             翻译后的文本
         """
+        if self._should_skip(text):
+            return text
+
         if not (self.ignore_cache or ignore_cache):
             cache = self.cache.get(text)
             if cache is not None:
                 return cache
 
+        return self._translate_uncached(text)
+
+    def _should_skip(self, text: str) -> bool:
+        """不含字母（纯数字、符号、公式）或仅为网址/邮箱的文本直接保留原文"""
+        stripped = _PLACEHOLDER_RE.sub("", text).strip()
+        if any(c.isalpha() for c in stripped) and not _NO_TRANSLATE_RE.fullmatch(stripped):
+            return False
+        with self._stats_lock:
+            self._skipped += 1
+        return True
+
+    def _translate_uncached(self, text: str) -> str:
+        """调用翻译引擎并写入缓存"""
         translation = self.do_translate(text)
         self.cache.set(text, translation)
         return translation
 
+    def translate_batch(self, texts: List[str], ignore_cache: bool = False) -> List[str]:
+        """
+        批量翻译文本，先查缓存，仅将未命中的文本（去重后）交给 do_translate_batch
+        Args:
+            texts: 要翻译的文本列表
+            ignore_cache: 是否忽略缓存
+        Returns:
+            与输入顺序一致的翻译结果列表
+        """
+        results: List[Optional[str]] = [None] * len(texts)
+        misses: Dict[str, List[int]] = {}  # 原文 -> 在 texts 中的位置
+        use_cache = not (self.ignore_cache or ignore_cache)
+        pending: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if self._should_skip(text):
+                results[i] = text
+            else:
+                pending.setdefault(text, []).append(i)
+        # 一次批量查询缓存，避免逐条访问数据库
+        cached = self.cache.get_many(list(pending)) if use_cache and pending else {}
+        for text, positions in pending.items():
+            cache = cached.get(text)
+            if cache is None:
+                misses[text] = positions
+                continue
+            for i in positions:
+                results[i] = cache
+
+        if misses:
+            sources = list(misses)
+            translations = self.do_translate_batch(sources)
+            # 一个事务写入整批结果
+            self.cache.set_many(list(zip(sources, translations)))
+            for text, translation in zip(sources, translations):
+                for i in misses[text]:
+                    results[i] = translation
+        return results
+
+    def cache_info(self) -> Dict[str, int]:
+        """返回进程内缓存及持久化缓存的命中统计"""
+        info = self.cache.stats()
+        with self._stats_lock:
+            info["skipped"] = self._skipped
+        return info
+
+    def cache_clear(self) -> None:
+        """清空本翻译器在进程内缓存中的条目及统计"""
+        self.cache.clear_memory()
+        with self._stats_lock:
+            self._skipped = 0
+
     @abstractmethod
     def do_translate(self, text: str) -> str:
         """
@@ -121,6 +193,16 @@ class BaseTranslator(ABC):
         """
         raise NotImplementedError
 
+    def do_translate_batch(self, texts: List[str]) -> List[str]:
+        """
+        批量执行翻译，默认逐条调用 do_translate；支持合并请求的子类可重写
+        Args:
+            texts: 要翻译的文本列表
+        Returns:
+            与输入顺序一致的翻译结果列表
+        """
+        return [self.do_translate(text) for text in texts]
+
     def prompt(self, text: str, prompt_template: Template | None = None) -> list[dict[str, str]]:
         """
         生成翻译提示 - 专注于英译中场景
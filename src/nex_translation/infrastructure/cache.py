@@ -1,7 +1,16 @@
+import atexit
+import hashlib
 import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Any, Dict
-from peewee import Model, SqliteDatabase, AutoField, CharField, TextField, SQL, Proxy
+from typing import Optional, Any, Dict, List, Tuple
+from peewee import (
+    Model, SqliteDatabase, AutoField, BlobField, CharField, IntegerField, TextField, Proxy, chunked,
+)
 from ..utils.logger import get_logger
 
 # 配置日志记录器
@@ -11,29 +20,100 @@ logger = get_logger(__name__)
 # 这是一个更灵活处理数据库绑定的方式，尤其是在测试和生产环境切换时
 db_proxy = Proxy()
 
+# WAL 模式下 synchronous=NORMAL 仍能保证一致性，只是断电时可能丢失最近的事务；
+# 缓存丢失可重新翻译，因此用更少的 fsync 换取写入速度。不使用 cache=shared，它与 WAL 配合更差
+PERFORMANCE_PRAGMAS = {
+    "synchronous": "normal",
+    "cache_size": -64000,       # 约 64 MiB 页缓存
+    "temp_store": "memory",
+    "mmap_size": 268435456,     # 256 MiB 内存映射读取
+    "foreign_keys": 0,
+}
 
-class _TranslationCache(Model):
-    """翻译缓存数据模型"""
+
+class _Params(Model):
+    """翻译引擎及参数表，每种组合只存一行，缓存条目以整数 id 引用"""
     id = AutoField()
     translate_engine = CharField(max_length=20)  # 翻译引擎名称
     translate_engine_params = TextField()        # 翻译参数（JSON格式）
+
+    class Meta:
+        database = db_proxy
+        indexes = ((("translate_engine", "translate_engine_params"), True),)
+
+
+class _TranslationCache(Model):
+    """翻译缓存数据模型"""
+    id = AutoField()
+    # 引擎、参数和原文的 16 字节哈希，唯一索引只比较这一列，B 树页更小
+    key_hash = BlobField(unique=True)
+    params_id = IntegerField()                   # 对应 _Params.id，代替每行重复保存的参数 JSON
     original_text = TextField()                  # 原始文本
-    translation = TextField()                    # 翻译结果
+    translation = TextField()                    # 翻译结果（压缩存储时为空字符串）
+    translation_blob = BlobField(null=True)      # 较长译文的 zlib 压缩数据
 
     class Meta:
         database = db_proxy  # 绑定到代理
-        constraints = [
-            SQL(
-                """
-                UNIQUE (
-                    translate_engine,
-                    translate_engine_params,
-                    original_text
-                )
-                ON CONFLICT REPLACE
-                """
-            )
-        ]
+
+# 点查询和写入使用预先拼好的原生 SQL，跳过 ORM 每次构建表达式树、生成 SQL 的开销
+_TABLE = _TranslationCache._meta.table_name
+_GET_SQL = (
+    f"SELECT translation, translation_blob FROM {_TABLE} WHERE key_hash=? LIMIT 1"
+)
+_SET_SQL = (
+    f"INSERT OR REPLACE INTO {_TABLE} "
+    "(key_hash, params_id, original_text, translation, translation_blob) VALUES (?, ?, ?, ?, ?)"
+)
+_PARAMS_TABLE = _Params._meta.table_name
+_INSERT_PARAMS_SQL = (
+    f"INSERT OR IGNORE INTO {_PARAMS_TABLE} (translate_engine, translate_engine_params) VALUES (?, ?)"
+)
+_SELECT_PARAMS_SQL = (
+    f"SELECT id FROM {_PARAMS_TABLE} WHERE translate_engine=? AND translate_engine_params=?"
+)
+
+_GET_MANY_SQL = (
+    f"SELECT key_hash, translation, translation_blob FROM {_TABLE} WHERE key_hash IN ({{}})"
+)
+GET_MANY_CHUNK_SIZE = 500  # 每条 IN 查询的最大参数个数，低于旧版 SQLite 的 999 个绑定变量限制
+
+# 超过该长度（字符数）的译文压缩后存入 translation_blob，减小数据库体积和读取的数据量
+COMPRESS_THRESHOLD = 512
+COMPRESS_LEVEL = 3
+
+
+def _pack_translation(translation: str) -> Tuple[str, Optional[bytes]]:
+    """返回写入 (translation, translation_blob) 两列的值"""
+    if len(translation) > COMPRESS_THRESHOLD:
+        return "", zlib.compress(translation.encode("utf-8"), COMPRESS_LEVEL)
+    return translation, None
+
+
+def _unpack_translation(translation: str, blob: Optional[bytes]) -> str:
+    """从 (translation, translation_blob) 两列还原译文"""
+    if blob is None:
+        return translation
+    return zlib.decompress(blob).decode("utf-8")
+
+# add_params 中可直接保存的参数类型，其他类型转换为字符串
+_JSON_TYPES = (str, int, float, bool, type(None), list, tuple, dict)
+
+# 每个线程缓存自己的数据库实例和 sqlite3 连接（peewee 连接本身也是按线程保存的）
+_tls = threading.local()
+
+# 进程内 LRU 读缓存，位于 SQLite 之前；键包含引擎和参数，所有 TranslationCache 实例共享
+LRU_CAPACITY = 50000
+_lru: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _lru_put(key: Tuple[str, str, str], translation: str) -> None:
+    """写入进程内缓存，超出容量时淘汰最久未使用的条目（调用方需持有 _lru_lock）"""
+    _lru[key] = translation
+    _lru.move_to_end(key)
+    if len(_lru) > LRU_CAPACITY:
+        _lru.popitem(last=False)
+
 
 class TranslationCache:
     """翻译缓存管理器"""
@@ -47,6 +127,10 @@ class TranslationCache:
         assert len(translate_engine) <= 20, "翻译引擎名称不能超过20个字符"  # 原为 < 20
         self.translate_engine = translate_engine
         self.params: Dict[str, Any] = {}
+        # 命中统计：进程内缓存命中、数据库命中、均未命中
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
 
         if db_instance is None:
             # 在测试中，我们总是希望显式传递 db_instance
@@ -61,28 +145,55 @@ class TranslationCache:
             self.db = db_instance  # 使用传入的数据库实例
 
         self.replace_params(translate_engine_params)  # 确保在 self.db 设置后调用
-
-    @staticmethod
-    def _sort_dict_recursively(obj: Any) -> Any:
-        """递归排序字典，确保相同内容的字典具有相同的字符串表示"""
-        if isinstance(obj, dict):
-            # 修正了之前版本中 for v in [obj[k]] 的冗余
-            return {
-                k: TranslationCache._sort_dict_recursively(obj[k])
-                for k in sorted(obj.keys())
-            }
-        elif isinstance(obj, list):
-            return [TranslationCache._sort_dict_recursively(item) for item in obj]
-        return obj
+        # 数据库是否可用只在构造时检查一次，热路径上不再重复 isinstance 判断
+        self._db_ready = self.refresh_db_state()
+
+    def refresh_db_state(self) -> bool:
+        """重新检查 self.db 是否为已初始化的数据库（例如代理被重新初始化后调用）"""
+        self._db_ready = isinstance(self.db, SqliteDatabase) or (
+            isinstance(self.db, Proxy) and self.db.obj is not None
+        )
+        return self._db_ready
+
+    def _prepare_db(self) -> bool:
+        """数据库尚未就绪时尝试初始化，返回是否可用"""
+        if self.refresh_db_state():
+            return True
+        if self.db is db_proxy:
+            get_default_db()  # 首次使用时才初始化生产数据库
+        if not self.refresh_db_state():
+            logger.error("Database initialization failed, cache is unavailable")
+            return False
+        return True
+
+    @property
+    def translate_engine_params(self) -> str:
+        """用于生成数据库键的参数（排序后的JSON），参数变更后首次读取时才重新生成"""
+        if self._params_json is None:
+            # sort_keys 在 C 层递归排序嵌套字典，与逐层重建排序后的字典结果一致
+            try:
+                self._params_json = json.dumps(self.params, sort_keys=True)
+            except TypeError:
+                # 容器中含有不可序列化的值时，将其转换为字符串
+                self._params_json = json.dumps(self.params, sort_keys=True, default=str)
+        return self._params_json
+
+    def _key_hash(self, original_text: str) -> bytes:
+        """计算数据库查找键：引擎、参数和原文拼接后的 16 字节 BLAKE2b 摘要"""
+        if self._key_prefix is None:
+            self._key_prefix = f"{self.translate_engine}\0{self.translate_engine_params}\0"
+        return hashlib.blake2b(
+            (self._key_prefix + original_text).encode("utf-8"), digest_size=16
+        ).digest()
 
     def replace_params(self, params: Optional[Dict[str, Any]] = None) -> None:
         """替换所有参数"""
         if params is None:
             params = {}
         self.params = params  # 存储原始（未排序）参数供内部使用
-        # 对用于生成数据库键的参数进行排序和JSON化
-        sorted_params_for_db = self._sort_dict_recursively(params.copy())  # 使用副本以防修改原始params
-        self.translate_engine_params = json.dumps(sorted_params_for_db)
+        self._params_json: Optional[str] = None  # 标记需要重新生成
+        self._key_prefix: Optional[str] = None
+        self._params_id: Optional[int] = None  # 首次写入时从 _Params 表查得
 
     def update_params(self, params: Optional[Dict[str, Any]] = None) -> None:
         """更新部分参数"""
@@ -95,66 +206,166 @@ class TranslationCache:
     def add_params(self, key: str, value: Any) -> None:
         """添加单个参数"""
         current_params = self.params.copy()
-        # 确保值可以被 JSON 序列化
-        try:
-            # 尝试 JSON 序列化，如果失败则转换为字符串
-            json.dumps(value)
+        # 只按类型判断能否被 JSON 序列化，不再为检查而完整序列化一次；
+        # 容器内若含不可序列化的值，由 translate_engine_params 生成 JSON 时兜底
+        if isinstance(value, _JSON_TYPES):
             current_params[key] = value
-        except (TypeError, OverflowError):
-            # 如果值不可序列化，则转换为字符串
+        else:
             current_params[key] = str(value)
         self.replace_params(current_params)
 
+    def open(self) -> None:
+        """为当前线程打开并保留数据库连接
+
+        peewee 的连接按线程保存。get/set 会自动调用本方法，连接在线程内复用，
+        不再每次调用都打开、关闭一次；长期运行的工作线程也可以预先调用一次。
+        """
+        self._conn()
+
+    def _conn(self) -> sqlite3.Connection:
+        """返回当前线程的 sqlite3 连接，读取时直接在其上执行，绕过 peewee 的执行层"""
+        if self.db is db_proxy:
+            db = get_default_db()  # fork 后代理被重置，首次使用时重新连接
+        else:
+            db = self.db.obj if isinstance(self.db, Proxy) else self.db
+        if getattr(_tls, "db", None) is not db:
+            db.connect(reuse_if_open=True)
+            _tls.db = db
+            _tls.conn = db.connection()
+        return _tls.conn
+
     def get(self, original_text: str) -> Optional[str]:
-        """获取缓存的翻译结果"""
+        """获取缓存的翻译结果，先查进程内缓存，未命中再查数据库"""
+        key = (self.translate_engine, self.translate_engine_params, original_text)
+        with _lru_lock:
+            translation = _lru.get(key)
+            if translation is not None:
+                _lru.move_to_end(key)
+                self.hits += 1
+                return translation
+        translation = self._get_from_db(original_text)
+        with _lru_lock:
+            if translation is None:
+                self.misses += 1
+            else:
+                self.db_hits += 1
+                _lru_put(key, translation)
+        return translation
+
+    def _get_from_db(self, original_text: str) -> Optional[str]:
+        """从数据库读取翻译结果"""
         try:
-            # 确保 self.db 是一个已初始化的 SqliteDatabase 实例
-            if not isinstance(self.db, SqliteDatabase) and not isinstance(self.db, Proxy) or \
-               (isinstance(self.db, Proxy) and self.db.obj is None):
-                logger.warning("Database not initialized for TranslationCache.get, attempting to initialize now")
-                # 尝试初始化数据库
-                init_db()
-                # 重新检查初始化是否成功
-                if not isinstance(self.db, SqliteDatabase) and not isinstance(self.db, Proxy) or \
-                   (isinstance(self.db, Proxy) and self.db.obj is None):
-                    logger.error("Database initialization failed, cannot retrieve from cache")
-                    return None
-
-            with self.db.connection_context():
-                cached_item = _TranslationCache.get_or_none(
-                    (_TranslationCache.translate_engine == self.translate_engine) &
-                    (_TranslationCache.translate_engine_params == self.translate_engine_params) &
-                    (_TranslationCache.original_text == original_text)
-                )
-                return cached_item.translation if cached_item else None
+            if not self._db_ready and not self._prepare_db():
+                return None
+            row = self._conn().execute(_GET_SQL, (self._key_hash(original_text),)).fetchone()
+            return _unpack_translation(*row) if row else None
         except Exception as e:
+            _tls.db = None  # 连接可能已被关闭，下次重新获取
             logger.debug(f"获取缓存时出错: {e}", exc_info=True)  # 添加 exc_info=True 获取更详细的堆栈信息
             return None
 
+    def get_many(self, texts: List[str]) -> Dict[str, str]:
+        """批量获取缓存的翻译结果，返回命中的 原文 -> 译文；数据库部分每批只查询一次"""
+        found: Dict[str, str] = {}
+        pending: List[str] = []
+        params = self.translate_engine_params
+        with _lru_lock:
+            for text in dict.fromkeys(texts):
+                translation = _lru.get((self.translate_engine, params, text))
+                if translation is not None:
+                    _lru.move_to_end((self.translate_engine, params, text))
+                    self.hits += 1
+                    found[text] = translation
+                else:
+                    pending.append(text)
+        if not pending:
+            return found
+
+        from_db = self._get_many_from_db(pending)
+        with _lru_lock:
+            for text in pending:
+                translation = from_db.get(text)
+                if translation is None:
+                    self.misses += 1
+                else:
+                    self.db_hits += 1
+                    _lru_put((self.translate_engine, params, text), translation)
+                    found[text] = translation
+        return found
+
+    def _get_many_from_db(self, texts: List[str]) -> Dict[str, str]:
+        """按 key_hash 分批查询数据库，避免逐条查询"""
+        result: Dict[str, str] = {}
+        try:
+            if not self._db_ready and not self._prepare_db():
+                return result
+            conn = self._conn()
+            for batch in chunked(texts, GET_MANY_CHUNK_SIZE):
+                keys = {self._key_hash(text): text for text in batch}
+                cursor = conn.execute(
+                    _GET_MANY_SQL.format(",".join("?" * len(keys))), tuple(keys)
+                )
+                for key_hash, translation, blob in cursor.fetchall():
+                    result[keys[bytes(key_hash)]] = _unpack_translation(translation, blob)
+        except Exception as e:
+            _tls.db = None
+            logger.debug(f"批量获取缓存时出错: {e}", exc_info=True)
+        return result
+
     def set(self, original_text: str, translation: str) -> None:
         """设置翻译缓存"""
+        self.set_many([(original_text, translation)])
+
+    def set_many(self, items: List[Tuple[str, str]]) -> None:
+        """批量设置翻译缓存，所有条目在同一个事务中写入"""
+        if not items:
+            return
+        params = self.translate_engine_params
+        with _lru_lock:
+            for original_text, translation in items:
+                _lru_put((self.translate_engine, params, original_text), translation)
         try:
-            if not isinstance(self.db, SqliteDatabase) and not isinstance(self.db, Proxy) or \
-               (isinstance(self.db, Proxy) and self.db.obj is None):
-                logger.warning("Database not initialized for TranslationCache.set, attempting to initialize now")
-                # 尝试初始化数据库
-                init_db()
-                # 重新检查初始化是否成功
-                if not isinstance(self.db, SqliteDatabase) and not isinstance(self.db, Proxy) or \
-                   (isinstance(self.db, Proxy) and self.db.obj is None):
-                    logger.error("Database initialization failed, cannot save to cache")
-                    return
-
-            with self.db.connection_context():
-                _TranslationCache.replace(  # 使用 replace 而不是 create 来利用 ON CONFLICT REPLACE
-                    translate_engine=self.translate_engine,
-                    translate_engine_params=self.translate_engine_params,
-                    original_text=original_text,
-                    translation=translation,
-                ).execute()
+            if not self._db_ready and not self._prepare_db():
+                return
+            conn = self._conn()
+            with self.db.atomic():
+                if self._params_id is None:
+                    key = (self.translate_engine, params)
+                    conn.execute(_INSERT_PARAMS_SQL, key)
+                    self._params_id = conn.execute(_SELECT_PARAMS_SQL, key).fetchone()[0]
+                rows = [
+                    (
+                        self._key_hash(original_text), self._params_id,
+                        original_text, *_pack_translation(translation),
+                    )
+                    for original_text, translation in items
+                ]
+                # executemany 复用同一条预编译语句，不受绑定变量数量限制
+                conn.executemany(_SET_SQL, rows)
         except Exception as e:
+            _tls.db = None
+            self._params_id = None
             logger.debug(f"设置缓存时出错: {e}", exc_info=True)
 
+    def stats(self) -> Dict[str, int]:
+        """返回本实例的命中统计及进程内缓存的占用"""
+        with _lru_lock:
+            return {
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "maxsize": LRU_CAPACITY,
+                "currsize": len(_lru),
+            }
+
+    def clear_memory(self) -> None:
+        """清除进程内缓存中属于当前引擎和参数的条目，并重置统计（不影响数据库）"""
+        prefix = (self.translate_engine, self.translate_engine_params)
+        with _lru_lock:
+            for key in [k for k in _lru if k[:2] == prefix]:
+                del _lru[key]
+            self.hits = self.db_hits = self.misses = 0
+
 
 # --- 生产环境数据库初始化 ---
 def init_db(remove_exists: bool = False) -> None:
@@ -166,7 +377,8 @@ def init_db(remove_exists: bool = False) -> None:
     cache_folder = Path.home() / ".cache" / "nex_translation"
     cache_folder.mkdir(parents=True, exist_ok=True)
 
-    cache_db_path = cache_folder / "cache.v1.db"
+    # v2 改为按 key_hash 查找，v3 增加压缩列，v4 将参数移到 _Params 表，表结构均不兼容旧文件，使用新文件
+    cache_db_path = cache_folder / "cache.v4.db"
 
     if remove_exists and cache_db_path.exists():
         try:
@@ -182,21 +394,53 @@ def init_db(remove_exists: bool = False) -> None:
         pragmas={
             "journal_mode": "wal",
             "busy_timeout": 1000,
+            **PERFORMANCE_PRAGMAS,
         },
     )
     # 将生产数据库实例初始化到全局代理
     db_proxy.initialize(prod_db)
+    # 连接在线程内长期保留，退出时关闭主线程的连接
+    atexit.register(prod_db.close)
 
     # 连接并创建表（通过代理）
     try:
         if db_proxy.is_closed():  # 检查代理包装的连接是否关闭
             db_proxy.connect(reuse_if_open=True)
-        db_proxy.create_tables([_TranslationCache], safe=True)
+        db_proxy.create_tables([_Params, _TranslationCache], safe=True)
         logger.info(f"生产数据库已初始化: {cache_db_path}")
     except Exception as e:
         logger.error(f"初始化生产数据库表失败: {e}", exc_info=True)
 
 
+_default_db_lock = threading.Lock()
+
+
+def get_default_db() -> Optional[SqliteDatabase]:
+    """返回生产数据库，首次调用时初始化（线程安全）；导入本模块不会访问磁盘"""
+    if db_proxy.obj is None:
+        with _default_db_lock:
+            if db_proxy.obj is None:
+                init_db()
+    return db_proxy.obj
+
+
+def _reset_db_after_fork() -> None:
+    """子进程中丢弃继承来的数据库连接
+
+    SQLite 连接不能跨 fork 使用；继承来的连接不关闭（关闭时可能对共享的 WAL 文件做检查点或删除），
+    只是不再使用。这里只把代理恢复为未初始化，不访问磁盘，子进程首次使用时由 get_default_db 重新初始化。
+    """
+    global _default_db_lock
+    _default_db_lock = threading.Lock()  # fork 时可能正被其他线程持有
+    _tls.__dict__.clear()
+    if db_proxy.obj is not None:
+        db_proxy.initialize(None)
+
+
+if hasattr(os, "register_at_fork"):  # Windows 没有 fork
+    os.register_at_fork(after_in_child=_reset_db_after_fork)
+
+
 # --- 测试环境数据库辅助函数 ---
 def init_test_db() -> SqliteDatabase:
     """初始化一个临时的、唯一的测试数据库，并返回该实例"""
@@ -213,6 +457,7 @@ def init_test_db() -> SqliteDatabase:
         pragmas={
             "journal_mode": "wal",
             "busy_timeout": 2000,  # 稍微增加超时，以应对并发测试
+            **PERFORMANCE_PRAGMAS,
         },
     )
     # 注意：这里不使用全局的 db_proxy.initialize(test_db_instance)
@@ -229,7 +474,7 @@ def init_test_db() -> SqliteDatabase:
     # 为了让测试中的 _TranslationCache 操作使用 test_db_instance，
     # 最好的方式是在测试期间动态地将模型的数据库绑定到 test_db_instance。
     # 这可以通过 Peewee 的 test_database 上下文管理器或手动设置完成。
-    # 然而，由于 TranslationCache 的 get/set 方法内部使用了 self.db.connection_context()，
+    # 然而，由于 TranslationCache 的 get/set 方法内部通过 self.db 打开连接，
     # 并且 _TranslationCache.Meta.database 是 db_proxy，
     # 我们需要确保在这些方法执行时，db_proxy 指向的是 test_db_instance。
     # 或者，修改 TranslationCache 的 get/set，使其能够使用模型显式绑定到特定数据库。
@@ -249,7 +494,7 @@ def init_test_db() -> SqliteDatabase:
     # 而是特定的 test_db_instance，那么需要确保模型操作使用这个实例。
     # Peewee 的 `Model.select().database(specific_db)` 可以做到。
 
-    # 当前的 TranslationCache.get/set 使用 self.db.connection_context()，
+    # 当前的 TranslationCache.get/set 通过 self._conn() 使用 self.db 的连接，
     # 这意味着它们期望 self.db 是一个 Peewee 数据库实例。
     # _TranslationCache 的操作（如 .get_or_none）会使用 _TranslationCache.Meta.database（即 db_proxy）。
     # 为了让测试隔离，我们需要在测试期间让 db_proxy 指向 test_db_instance。
@@ -304,8 +549,3 @@ def clean_test_db(test_db_instance: SqliteDatabase) -> None:
         if Path(db_path_str).exists() or Path(db_path_str + "-wal").exists() or Path(db_path_str + "-shm").exists():
              logger.warning(f"重试后仍未能完全清理测试数据库文件: {db_path_str}")
 
-
-# 在模块加载时初始化生产环境数据库
-init_db() # 自动初始化数据库，确保在使用TranslationCache前数据库已准备好
-# 虽然库通常不在导入时执行有副作用的操作，但这里为了确保缓存功能正常工作，
-# 我们在模块加载时就初始化数据库，避免"Database not initialized"错误
\ No newline at end of file
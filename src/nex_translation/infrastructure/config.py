@@ -1,12 +1,16 @@
+from functools import lru_cache
 from pathlib import Path
-from threading import RLock
+from threading import RLock, Timer
+import atexit
 import json
+import os
 from typing import Any, Dict, Optional
-import copy
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+SAVE_DELAY = 0.25  # 配置修改后延迟写入文件的秒数
+
 class ConfigManager:
     """
     配置管理器(单例模式实现)
@@ -19,8 +23,9 @@ class ConfigManager:
     _lock = RLock()  # 使用RLock以支持同一线程多次获取
 
     @staticmethod
+    @lru_cache(maxsize=256)
     def normalize_service_name(service_name: str) -> str:
-        """规范化服务名称"""
+        """规范化服务名称（服务名只有少数几种，结果按输入缓存）"""
         return service_name.lower().strip()
 
     @classmethod
@@ -51,7 +56,16 @@ class ConfigManager:
         
         self._config_path = Path.home() / ".config" / "NexTranslation" / "config.json"
         self._config_data = {}
+        # 由配置派生的缓存，配置加载或保存时失效
+        self._enabled_services: Optional[tuple] = None
+        self._default_service: Optional[str] = None
+        self._translator_index: Optional[Dict[str, Dict[str, Any]]] = None  # 规范化名称 -> envs
+        self._mtime_ns = 0  # 最近一次加载或保存时配置文件的修改时间
+        # 延迟写入：连续多次修改只在短暂空闲后写一次文件
+        self._dirty = False
+        self._flush_timer: Optional[Timer] = None
         self._ensure_config_exists()
+        atexit.register(self._flush)
 
     def _ensure_config_exists(self, isInit=True):
         """
@@ -94,7 +108,7 @@ class ConfigManager:
                     "HIDDEN_GRADIO_DETAILS": False, # 是否隐藏Gradio中的API Key等细节
                     "DEMO_MODE": False # 是否为演示模式
                 }
-                self._save_config()
+                self.save()
             else:
                 raise ValueError(f"Config file {self._config_path} not found!")
         else: # 如果文件已存在
@@ -124,22 +138,27 @@ class ConfigManager:
         2. 查找匹配配置
         3. 返回环境变量配置
         """
-        normalized_name = self.normalize_service_name(translator_name)
-        translators = self._config_data.get("translators", [])
-        for translator in translators:
-            if self.normalize_service_name(translator.get("name")) == normalized_name:
-                return translator.get("envs", {})
-        return {}
+        if self._translator_index is None:
+            index = {}
+            for translator in self._config_data.get("translators", []):
+                name = self.normalize_service_name(translator.get("name"))
+                index.setdefault(name, translator.get("envs", {}))  # 同名时保留第一项
+            self._translator_index = index
+        return self._translator_index.get(self.normalize_service_name(translator_name), {})
 
     def get_default_service(self) -> str:
         """获取默认翻译服务"""
-        service = self._config_data.get("DEFAULT_SERVICE", "google")
-        return self.normalize_service_name(service)
+        if self._default_service is None:
+            service = self._config_data.get("DEFAULT_SERVICE", "google")
+            self._default_service = self.normalize_service_name(service)
+        return self._default_service
 
     def get_enabled_services(self) -> list:
         """获取启用的翻译服务列表"""
-        services = self._config_data.get("ENABLED_SERVICES", ["google"])
-        return [self.normalize_service_name(s) for s in services]
+        if self._enabled_services is None:
+            services = self._config_data.get("ENABLED_SERVICES", ["google"])
+            self._enabled_services = tuple(self.normalize_service_name(s) for s in services)
+        return list(self._enabled_services)
 
     def update_translator_config(self, translator_name: str, new_translator_envs: Dict[str, Any]):
         """更新翻译器配置"""
@@ -148,7 +167,7 @@ class ConfigManager:
             translators = self._config_data.get("translators", [])
             for translator in translators:
                 if self.normalize_service_name(translator.get("name")) == normalized_name:
-                    translator["envs"] = copy.deepcopy(new_translator_envs)
+                    translator["envs"] = dict(new_translator_envs)
                     self._save_config()
                     return
             
@@ -157,7 +176,7 @@ class ConfigManager:
                 
             self._config_data["translators"].append({
                 "name": normalized_name,
-                "envs": copy.deepcopy(new_translator_envs)
+                "envs": dict(new_translator_envs)
             })
             self._save_config()
 
@@ -166,21 +185,75 @@ class ConfigManager:
         self._config_data["DEFAULT_SERVICE"] = service_name
         self._save_config()
 
+    def reload(self):
+        """重新从文件加载配置，并清除派生缓存；文件未修改时不重复解析
+
+        配置文件通过原子替换写入，读取时无需加锁。
+        """
+        self.save()  # 先写入尚未落盘的修改，避免被文件内容覆盖
+        self._load_config()
+
+    def invalidate(self):
+        """清除由配置派生的缓存（例如测试中直接修改了配置数据之后）"""
+        with self._lock:
+            self._invalidate_cache()
+
+    def _invalidate_cache(self):
+        """清除由配置派生的缓存"""
+        self._enabled_services = None
+        self._default_service = None
+        self._translator_index = None
+
     def _save_config(self):
-        """保存配置到文件"""
+        """标记配置已修改，并在短暂延迟后写入文件；期间的其他修改合并为一次写入"""
+        with self._lock:
+            self._invalidate_cache()
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = Timer(SAVE_DELAY, self._flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush(self):
+        """定时器或退出时调用，写入失败只记录日志"""
+        try:
+            self.save()
+        except Exception:
+            pass
+
+    def save(self):
+        """立即将尚未写入的修改保存到文件"""
         with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty and self._config_path.exists():
+                return
             try:
-                with open(self._config_path, 'w', encoding='utf-8') as f:
-                    json.dump(self._config_data, f, indent=4, ensure_ascii=False)
+                # json.dump 会把编码结果分成许多小块逐一写入，先整体序列化再一次写入
+                content = json.dumps(self._config_data, indent=4, ensure_ascii=False)
+                # 先写临时文件再原子替换，读取方不会看到写了一半的 JSON
+                tmp_path = self._config_path.with_suffix(".json.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, self._config_path)
+                # 记录自己写入后的修改时间，避免下次 reload 重新解析
+                self._mtime_ns = self._config_path.stat().st_mtime_ns
+                self._dirty = False
             except Exception as e:
                 logger.error(f"Failed to save config: {str(e)}")
                 raise
 
     def _load_config(self):
-        """从文件加载配置"""
+        """从文件加载配置，修改时间与上次加载相同则跳过"""
         try:
-            with open(self._config_path, 'r', encoding='utf-8') as f:
-                self._config_data = json.load(f)
+            mtime_ns = self._config_path.stat().st_mtime_ns
+            if mtime_ns == self._mtime_ns:
+                return
+            # 一次读入字节直接解析（json.loads 会自动识别 UTF-8），省去文本层的逐块解码
+            self._config_data = json.loads(self._config_path.read_bytes())
+            self._mtime_ns = mtime_ns
+            self._invalidate_cache()
         except Exception as e:
             logger.error(f"Failed to load config: {str(e)}")
             raise
\ No newline at end of file
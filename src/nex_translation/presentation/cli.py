@@ -5,44 +5,15 @@ import sys
 import os
 from pathlib import Path
 from string import Template
-from typing import List, Optional
 import time
 import logging
-from tqdm import tqdm
 
-# 从项目中导入
+# 从项目中导入；翻译核心、布局模型和配置依赖较重（onnxruntime、PyMuPDF 等），
+# 在 main() 中确实需要时才导入，使 --help / --version 等路径快速返回
 from nex_translation import __version__, logger # 使用 __init__ 中的 logger
-from nex_translation.core.pdf_processor import translate
-from nex_translation.core.doclayout import DocLayoutModel
-from nex_translation.infrastructure.config import ConfigManager
 from nex_translation.utils.logger import set_log_level, enable_debug
 from nex_translation.utils.exceptions import NexTranslationError
-
-def parse_page_ranges(page_str: Optional[str]) -> Optional[List[int]]:
-    """将 '1,3,5-7' 这样的字符串解析为页面索引列表 [0, 2, 4, 5, 6]。"""
-    if not page_str:
-        return None
-    pages = set()
-    try:
-        for part in page_str.split(','):
-            part = part.strip()
-            if '-' in part:
-                start, end = map(int, part.split('-'))
-                if start < 1 or end < start:
-                    raise ValueError(f"无效的页面范围: {part}")
-                # 使用 0-based 索引
-                pages.update(range(start - 1, end))
-            else:
-                page_num = int(part)
-                if page_num < 1:
-                    raise ValueError(f"无效的页码: {part}")
-                # 使用 0-based 索引
-                pages.add(page_num - 1)
-        return sorted(list(pages))
-    except ValueError as e:
-        logger.error(f"无效的页面范围格式: {page_str}。错误: {e}")
-        # 重新抛出异常以停止执行
-        raise
+from nex_translation.utils.page_ranges import PageRanges, parse as parse_page_ranges
 
 def format_time(seconds: float) -> str:
     """将秒数格式化为人类可读的时间字符串"""
@@ -55,7 +26,42 @@ def format_time(seconds: float) -> str:
         hours = seconds / 3600
         return f"{hours:.1f}小时"
 
-def main():
+def _page_ranges_arg(page_str: str) -> PageRanges:
+    """--pages 的参数类型：解析失败时由 argparse 报错退出，不会加载模型"""
+    try:
+        return parse_page_ranges(page_str)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+MAX_THREADS = 64  # --thread 允许的最大线程数
+
+def _thread_count_arg(value: str) -> int:
+    """--thread 的参数类型：必须是 1 到 MAX_THREADS 之间的整数"""
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的线程数: {value}")
+    if not 1 <= count <= MAX_THREADS:
+        raise argparse.ArgumentTypeError(f"线程数必须在 1 到 {MAX_THREADS} 之间: {value}")
+    return count
+
+class _ServiceAction(argparse.Action):
+    """--service 的取值检查：仅在给出该参数时读取配置，确认服务已启用"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from nex_translation.infrastructure.config import ConfigManager
+
+        config_manager = ConfigManager.get_instance()
+        service = config_manager.normalize_service_name(values)
+        enabled_services = config_manager.get_enabled_services()
+        if service not in enabled_services:
+            parser.error(
+                f"argument {'/'.join(self.option_strings)}: 服务 '{values}' 未启用（可选: {', '.join(enabled_services)}）"
+            )
+        setattr(namespace, self.dest, service)
+
+def _build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器（仅依赖 argparse）"""
     parser = argparse.ArgumentParser(
         description="NexTranslation: 翻译 PDF 文档并保留布局。",
         # 自动显示默认值
@@ -76,20 +82,21 @@ def main():
     )
     parser.add_argument(
         "--pages", "-p",
-        type=str,
+        type=_page_ranges_arg,
         default=None,
         help="指定要翻译的页面范围，例如 '1,3,5-7'。如果未指定，则翻译所有页面。",
     )
     parser.add_argument(
         "--service", "-s",
         type=str,
+        action=_ServiceAction,
         # 将从配置中获取默认值
         default=None,
         help="要使用的翻译服务（例如 'google', 'openai', 'deepl'）。覆盖配置中的默认值。",
     )
     parser.add_argument(
         "--thread", "-t",
-        type=int,
+        type=_thread_count_arg,
         default=4,
         help="用于并行翻译的线程数。",
     )
@@ -146,7 +153,10 @@ def main():
         default=False,
         help="启动图形用户界面 (GUI) 模式。",
     )
+    return parser
 
+def main():
+    parser = _build_parser()
     args = parser.parse_args()
 
     if args.gui:
@@ -164,6 +174,10 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    _run(args)
+
+def _run(args: argparse.Namespace) -> None:
+    """加载配置和模型并执行翻译，结束时以相应的退出码退出"""
     # --- 设置 ---
     if args.debug:
         # 设置日志级别为 DEBUG
@@ -176,6 +190,10 @@ def main():
     logger.info(f"启动 NexTranslation v{__version__}")
 
     try:
+        from nex_translation.core.pdf_processor import translate
+        from nex_translation.core.doclayout import DocLayoutModel
+        from nex_translation.infrastructure.config import ConfigManager
+
         # 加载配置和模型
         config_manager = ConfigManager.get_instance()
         layout_model = DocLayoutModel.load_available()
@@ -192,8 +210,8 @@ def main():
             service_to_use = config_manager.get_default_service()
         logger.info(f"使用的翻译服务: {service_to_use}")
         
-        # 解析页面
-        page_list = parse_page_ranges(args.pages)
+        # 页面范围已由 argparse 解析
+        page_list = args.pages
         if page_list is not None:
              logger.info(f"目标页面 (0-based 索引): {page_list}")
         else:
@@ -222,12 +240,6 @@ def main():
         logger.info(f"正在处理 {len(args.files)} 个文件...")
         start_time = time.time()
 
-        def progress_callback(t: tqdm):
-            """翻译进度回调函数"""
-            # 这里可以实现进度显示逻辑
-            # 例如，打印当前进度
-            print(f"\r翻译进度: {t.n}/{t.total} ({t.n/t.total*100:.1f}%)", end="")
-        
         # 准备环境变量
         envs = {}
         
@@ -249,8 +261,8 @@ def main():
             prompt=prompt_template,
             skip_subset_fonts=args.skip_subset_fonts,
             ignore_cache=args.ignore_cache,
-            # 传递进度回调
-            callback=progress_callback
+            # 进度由 translate 内部的 tqdm 进度条显示，无需额外回调
+            callback=None
         )
 
         end_time = time.time()
@@ -281,7 +293,7 @@ def main():
     except FileNotFoundError as e:
         logger.error(f"文件未找到: {e}")
         sys.exit(1)
-    except ValueError as e: # 捕获页面范围解析错误
+    except ValueError as e:
         logger.error(f"配置错误: {e}")
         sys.exit(1)
     except KeyboardInterrupt:
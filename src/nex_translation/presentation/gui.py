@@ -1,31 +1,27 @@
-import asyncio
-import cgi
 import os
 import shutil
-import uuid
+import threading
+import time
+from itertools import count
 from pathlib import Path
-import typing as T
+from types import MappingProxyType
 import zipfile
+from functools import lru_cache
 
 import gradio as gr
-import requests
 import tqdm
 from gradio_pdf import PDF
 from string import Template
 import logging
 
-from nex_translation import __version__
 from nex_translation.core.pdf_processor import translate
-from nex_translation.core.doclayout import ModelInstance
+from nex_translation.core.doclayout import DocLayoutModel
 from nex_translation.infrastructure.config import ConfigManager
 from nex_translation.core.translator import BaseTranslator
 from nex_translation.core.google_translator import GoogleTranslator
-from nex_translation.core.doclayout import OnnxModel
+from nex_translation.utils.page_ranges import parse as parse_page_ranges
 
 # --- 全局初始化 ---
-# 加载模型
-model = OnnxModel.load_available()
-ModelInstance.value = model
 logger = logging.getLogger(__name__)
 
 # 获取配置管理器单例
@@ -39,17 +35,31 @@ service_map: dict[str, BaseTranslator] = {
     # "DeepL": DeepLTranslator,  # 示例
 }
 
-# 固定的语言配置：英文到中文
-LANG_FROM = "en"
-LANG_TO = "zh"
+# 每个服务的环境变量名（及是否为 API Key），以及对应输入框在 envs_inputs 中的区间；
+# 界面按 service_map 的顺序创建输入框，这里只计算一次
+service_env_keys: dict[str, tuple[tuple[str, bool], ...]] = {}
+service_env_slices: dict[str, slice] = {}  # 键为小写服务名
+_offset = 0
+for _name, _cls in service_map.items():
+    service_env_keys[_name] = tuple((key, "API_KEY" in key.upper()) for key in _cls.envs)
+    service_env_slices[_name.lower()] = slice(_offset, _offset + len(_cls.envs))
+    _offset += len(_cls.envs)
 
-# 页面范围选项
-page_map = {
+
+@lru_cache(maxsize=16)
+def _prompt_template(prompt: str) -> Template:
+    """相同的提示文本复用同一个 Template"""
+    return Template(prompt)
+
+
+# 页面范围选项（只读）；range 支持 len 和 in，无需展开为列表
+page_map = MappingProxyType({
     "全部页面": None,
-    "仅第一页": [0],
-    "前5页": list(range(5)),
+    "仅第一页": range(1),
+    "前5页": range(5),
     "自定义": None,
-}
+})
+page_choices = list(page_map)
 
 # --- GUI 配置 ---
 # 从配置加载启用的服务
@@ -68,16 +78,19 @@ else:
 # 是否隐藏Gradio界面中的敏感信息
 hidden_gradio_details: bool = config_manager.get("HIDDEN_GRADIO_DETAILS", False)
 
-# 全局取消事件映射
-cancellation_event_map = {}
+# 全局取消事件映射，键为进程内递增的会话编号（从 1 开始，0 与未开始的会话区分）
+cancellation_event_map: dict[int, threading.Event] = {}
+_session_counter = count(1)
 
 # --- 后端函数 ---
 def stop_translate_file(state: dict) -> None:
     """停止翻译过程"""
     session_id = state.get("session_id")
-    if session_id and session_id in cancellation_event_map:
+    # 单次查找，避免与 translate_file 的清理并发时出现 KeyError
+    event = cancellation_event_map.get(session_id) if session_id else None
+    if event is not None:
         logger.info(f"正在停止会话 {session_id} 的翻译任务。")
-        cancellation_event_map[session_id].set()
+        event.set()
 
 
 def translate_file(
@@ -95,9 +108,10 @@ def translate_file(
     *envs,
 ):
     """Gradio界面的翻译核心函数 (支持批量处理)"""
-    session_id = uuid.uuid4()
+    session_id = next(_session_counter)
     state["session_id"] = session_id
-    cancellation_event_map[session_id] = asyncio.Event()
+    # 翻译在 Gradio 工作线程中同步执行，取消请求来自另一个线程，需使用线程安全的 Event
+    cancellation_event_map[session_id] = threading.Event()
 
     progress(0, desc="开始批量翻译...")
 
@@ -110,9 +124,17 @@ def translate_file(
     source_paths = []
     for f in file_inputs:
         try:
-            # Gradio 的 file 组件返回的是一个临时路径，需要复制
-            copied_path = shutil.copy(f.name, output_dir)
-            source_paths.append(copied_path)
+            # Gradio 的 file 组件返回的是一个临时路径，在输出目录中保留一份输入；
+            # 优先创建硬链接（同一文件系统上无需复制数据），失败时再复制
+            src_path = f.name
+            dst_path = output_dir / os.path.basename(src_path)
+            try:
+                if dst_path.exists():
+                    dst_path.unlink()
+                os.link(src_path, dst_path)
+            except OSError:
+                shutil.copy(src_path, dst_path)
+            source_paths.append(str(dst_path))
         except AttributeError:
              raise gr.Error("文件输入无效，请重新上传。")
 
@@ -120,35 +142,38 @@ def translate_file(
 
     # 解析页面范围
     if page_range == "自定义":
-        selected_pages = []
-        if page_input:
-            try:
-                for p_part in page_input.split(','):
-                    p_part = p_part.strip()
-                    if '-' in p_part:
-                        start, end = map(int, p_part.split('-'))
-                        selected_pages.extend(range(start - 1, end))
-                    else:
-                        selected_pages.append(int(p_part) - 1)
-            except ValueError:
-                raise gr.Error("无效的页面范围格式，请使用如 '1, 3-5' 的格式。")
+        try:
+            selected_pages = parse_page_ranges(page_input)
+        except ValueError as e:
+            raise gr.Error(f"无效的页面范围格式，请使用如 '1, 3-5' 的格式。({e})")
     else:
         selected_pages = page_map[page_range]
 
     # 准备环境变量
     _envs = {}
-    for i, (key, _) in enumerate(translator_cls.envs.items()):
-        # 假设 envs 列表与 translator_cls.envs 的顺序匹配
-        _envs[key] = envs[i]
+    # envs 包含所有服务的输入框，只取当前服务对应的区间
+    service_envs = envs[service_env_slices[service.lower()]]
+    for (key, is_api_key), value in zip(service_env_keys[service], service_envs):
+        _envs[key] = value
         # 如果是API Key且界面上显示为***，从配置加载真实值
-        if "API_KEY" in key.upper() and envs[i] == "***":
+        if is_api_key and value == "***":
             real_key = config_manager.get_env_by_translatername(translator_cls, key)
             if not real_key:
                  raise gr.Error(f"未在配置中找到 {service} 的 API 密钥。")
             _envs[key] = real_key
 
+    last_percent = [-1]  # 上次推送到界面的整数百分比
+
     def progress_bar_callback(t: tqdm):
         """tqdm进度条的回调函数，用于更新Gradio的进度条"""
+        if not t.total:
+            return
+        # 每次推送都是一条 WebSocket 消息：回调的时间间隔已由 translate_patch 按
+        # PROGRESS_MIN_INTERVAL 节流，这里只跳过百分比未变化的推送，避免频繁重绘界面
+        percent = int(t.n * 100 / t.total)
+        if percent == last_percent[0]:
+            return
+        last_percent[0] = percent
         desc = getattr(t, "desc", "正在翻译...")
         if not desc:
             desc = "正在翻译..."
@@ -159,18 +184,16 @@ def translate_file(
         param = {
             "files": source_paths,
             "pages": selected_pages,
-            "lang_in": LANG_FROM,
-            "lang_out": LANG_TO,
             "service": service.lower(), # 服务名称使用小写
             "output": str(output_dir),
             "thread": int(threads),
             "callback": progress_bar_callback,
             "cancellation_event": cancellation_event_map.get(session_id),
-            "envs": _envs,
-            "prompt": Template(prompt) if prompt else None,
+            "envs": MappingProxyType(_envs),  # 只读传递，下游不会修改
+            "prompt": _prompt_template(prompt) if prompt else None,
             "skip_subset_fonts": skip_subset_fonts,
             "ignore_cache": ignore_cache,
-            "model": ModelInstance.value,
+            "model": DocLayoutModel.load_available(),  # 首次翻译时才加载，不阻塞界面启动
         }
         
         # 调用核心翻译函数
@@ -182,29 +205,19 @@ def translate_file(
         progress(0.9, desc="打包文件中...")
         
         # --- Zipping logic ---
-        zip_output_dir = Path("output")
-        zip_output_dir.mkdir(exist_ok=True)
-        zip_path = zip_output_dir / f"translation_{session_id}.zip"
+        # 输出目录在开始翻译前已创建
+        # 会话编号在进程重启后从头开始，加上时间戳避免覆盖之前的压缩包
+        zip_path = output_dir / f"translation_{time.strftime('%Y%m%d-%H%M%S')}_{session_id}.zip"
         
-        temp_zip_src_dir = zip_output_dir / f"temp_{session_id}"
-        mono_dir = temp_zip_src_dir / "单语版本"
-        dual_dir = temp_zip_src_dir / "双语版本"
-        mono_dir.mkdir(parents=True, exist_ok=True)
-        dual_dir.mkdir(parents=True, exist_ok=True)
-        
-        for mono_path, dual_path in result_files:
-            if Path(mono_path).exists():
-                shutil.copy(mono_path, mono_dir)
-            if Path(dual_path).exists():
-                shutil.copy(dual_path, dual_dir)
-        
-        shutil.make_archive(
-            base_name=str(zip_path.with_suffix('')), 
-            format='zip', 
-            root_dir=temp_zip_src_dir
-        )
-        
-        shutil.rmtree(temp_zip_src_dir)
+        # 直接写入压缩包，避免先复制到临时目录再打包
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for mono_path, dual_path in result_files:
+                for path, folder in ((mono_path, "单语版本"), (dual_path, "双语版本")):
+                    # zf.write 本身会 stat 文件，缺失时直接跳过，不再单独检查 exists()
+                    try:
+                        zf.write(path, f"{folder}/{os.path.basename(path)}")
+                    except FileNotFoundError:
+                        pass
 
         progress(1.0, desc="翻译完成！")
         
@@ -219,10 +232,15 @@ def translate_file(
         logger.error(f"翻译过程中发生错误: {e}", exc_info=True)
         raise gr.Error(f"翻译失败: {e}")
     finally:
-        if session_id in cancellation_event_map:
-            del cancellation_event_map[session_id]
+        cancellation_event_map.pop(session_id, None)
 
 # --- GUI 布局 ---
+# 设置环境变量 NEX_DEBUG 时才以调试模式启动 Gradio
+GUI_DEBUG = bool(os.environ.get("NEX_DEBUG"))
+
+TITLE_MARKDOWN = "# NexTranslation - PDF文档翻译工具"
+DESCRIPTION_MARKDOWN = "专注于英文到中文的PDF文档翻译，保留原始布局。"
+
 custom_css = """
 footer {visibility: hidden}
 .input-file { border: 1.2px dashed #165DFF !important; border-radius: 6px !important; }
@@ -231,8 +249,8 @@ footer {visibility: hidden}
 """
 
 with gr.Blocks(title="NexTranslation", css=custom_css) as demo:
-    gr.Markdown("# NexTranslation - PDF文档翻译工具")
-    gr.Markdown("专注于英文到中文的PDF文档翻译，保留原始布局。")
+    gr.Markdown(TITLE_MARKDOWN)
+    gr.Markdown(DESCRIPTION_MARKDOWN)
 
     with gr.Row():
         with gr.Column(scale=1):
@@ -251,13 +269,17 @@ with gr.Blocks(title="NexTranslation", css=custom_css) as demo:
                 interactive=True,
             )
             
+            # 输入框按 service_map 顺序创建，与 service_env_slices 的区间一致
             envs_inputs = []
             with gr.Group():
                 for service_name, translator_cls in service_map.items():
-                    for env_key, default_val in translator_cls.envs.items():
-                        config_val = config_manager.get_env_by_translatername(translator_cls, env_key, default_val)
-                        is_api_key = "API_KEY" in env_key.upper()
-                        display_val = "***" if hidden_gradio_details and is_api_key and config_val else config_val
+                    saved_envs = config_manager.get_translator_config(translator_cls.name)
+                    for env_key, is_api_key in service_env_keys[service_name]:
+                        config_val = saved_envs.get(env_key, translator_cls.envs[env_key])
+                        if hidden_gradio_details and is_api_key and config_val:
+                            display_val = "***"
+                        else:
+                            display_val = config_val
                         
                         textbox = gr.Textbox(
                             label=f"{service_name} - {env_key}",
@@ -269,7 +291,7 @@ with gr.Blocks(title="NexTranslation", css=custom_css) as demo:
 
             gr.Markdown("### 2. 设置页面范围")
             page_range = gr.Radio(
-                choices=list(page_map.keys()),
+                choices=page_choices,
                 label="页面范围",
                 value="全部页面",
             )
@@ -321,11 +343,12 @@ with gr.Blocks(title="NexTranslation", css=custom_css) as demo:
     )
 
     def on_select_service(service_choice):
-        updates = []
-        for service_name, translator_cls in service_map.items():
-            for _ in translator_cls.envs:
-                updates.append(gr.update(visible=service_name.lower() == service_choice.lower()))
-        
+        choice = service_choice.lower()
+        updates = [gr.update(visible=False)] * len(envs_inputs)
+        selected = service_env_slices.get(choice)
+        if selected is not None:
+            updates[selected] = [gr.update(visible=True)] * (selected.stop - selected.start)
+
         if not updates:
             return None # No envs for any service
         
@@ -359,7 +382,8 @@ def setup_gui(server_port=7860, share=False):
             server_port=server_port,
             inbrowser=True,
             share=share,
-            debug=True,
+            debug=GUI_DEBUG,
+            show_error=True,
         )
     except Exception as e:
         logger.error(f"启动Gradio界面失败: {e}")
@@ -368,7 +392,8 @@ def setup_gui(server_port=7860, share=False):
             server_port=server_port,
             inbrowser=True,
             share=share,
-            debug=True
+            debug=GUI_DEBUG,
+            show_error=True,
         )
 
 if __name__ == "__main__":
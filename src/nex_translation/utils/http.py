@@ -0,0 +1,29 @@
+"""HTTP 会话
+
+翻译服务和远程 PDF 下载共用的 requests 会话配置。
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 对限流和服务端临时错误做指数退避重试
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+
+def make_retrying_session(pool_connections: int, pool_maxsize: int) -> requests.Session:
+    """创建带连接池和自动重试的会话，http 与 https 共用同一个适配器"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(
+            total=RETRY_TOTAL,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUS_FORCELIST,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,72 @@
+"""页面范围解析
+
+命令行和图形界面共用的页码字符串解析，例如 '1,3,5-7'。
+"""
+import re
+from bisect import bisect_right
+from itertools import chain
+from typing import Iterable, Iterator, Optional, Tuple
+
+# 单个页码或页码范围，例如 "3" 或 "5-7"（允许两侧空白）
+_RANGE_RE = re.compile(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?")
+
+
+class PageRanges:
+    """
+    页面集合，按合并后的闭区间 [start, end]（0-based）保存，不展开为逐页列表。
+    支持 in（二分查找）、len、迭代和真值判断，可直接作为 translate 的 pages 参数。
+    """
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]]):
+        merged: list = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    def __contains__(self, page: object) -> bool:
+        i = bisect_right(self._starts, page) - 1
+        return i >= 0 and page <= self._ends[i]
+
+    def __len__(self) -> int:
+        return sum(end - start + 1 for start, end in zip(self._starts, self._ends))
+
+    def __iter__(self) -> Iterator[int]:
+        return chain.from_iterable(
+            range(start, end + 1) for start, end in zip(self._starts, self._ends)
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._starts)
+
+    def __repr__(self) -> str:
+        return f"PageRanges({list(zip(self._starts, self._ends))})"
+
+
+def parse(page_str: Optional[str]) -> Optional[PageRanges]:
+    """
+    将 '1,3,5-7' 这样的字符串（页码从 1 开始）解析为页面集合，包含页面索引 0, 2, 4, 5, 6。
+    空字符串或 None 返回 None，表示全部页面；格式错误时抛出 ValueError。
+    """
+    if not page_str or not page_str.strip():
+        return None
+    ranges = []
+    for part in page_str.split(','):
+        match = _RANGE_RE.fullmatch(part)
+        if match is None:
+            raise ValueError(f"无效的页面范围: {part.strip()}")
+        start = int(match.group(1))
+        if match.group(2) is None:
+            if start < 1:
+                raise ValueError(f"无效的页码: {part.strip()}")
+            end = start
+        else:
+            end = int(match.group(2))
+            if start < 1 or end < start:
+                raise ValueError(f"无效的页面范围: {part.strip()}")
+        # 使用 0-based 索引
+        ranges.append((start - 1, end - 1))
+    return PageRanges(ranges)